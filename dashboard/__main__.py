@@ -1,13 +1,17 @@
 """Entry point for the blog dashboard."""
 
 import argparse
+import asyncio
 import os
 import signal
 import sys
 
 import uvicorn
 
+from . import db
 from .config import HOST, PORT, PID_FILE, PROJECT_ROOT
+from .services.link_import import parse_links
+from .services.linklog_index import linklog_index
 
 
 def write_pid():
@@ -68,6 +72,37 @@ def start_server():
         remove_pid()
 
 
+async def _import_links(text: str, tags: list[str]) -> tuple[int, int, int]:
+    links, invalid = parse_links(text, tags)
+    await db.init_db()
+    try:
+        await linklog_index.sync()
+        inserted = await db.add_links(links)
+    finally:
+        await db.close_db()
+    return inserted, len(links) - inserted, invalid
+
+
+def import_links(path: str, tags: list[str]) -> int:
+    """Queue the links in a reading-list file (or stdin for "-")."""
+    try:
+        text = sys.stdin.read() if path == "-" else open(path, encoding="utf-8").read()
+    except OSError as e:
+        print(f"Could not read {path}: {e}")
+        return 1
+
+    try:
+        inserted, duplicates, invalid = asyncio.run(_import_links(text, tags))
+    except ValueError as e:
+        print(f"Could not parse {path}: {e}")
+        return 1
+
+    print(f"Inserted {inserted} link(s), skipped {duplicates} duplicate(s)")
+    if invalid:
+        print(f"Ignored {invalid} entry(ies) that were not http(s) URLs")
+    return 0
+
+
 def main():
     """Entry point for `uv run write`"""
     parser = argparse.ArgumentParser(description="Blog Dashboard server")
@@ -76,10 +111,24 @@ def main():
         action="store_true",
         help="Stop a running server",
     )
+    subparsers = parser.add_subparsers(dest="command")
+    import_parser = subparsers.add_parser(
+        "import",
+        help="Queue links from a URL list, OPML file or bookmarks export",
+    )
+    import_parser.add_argument("file", help="File to import, or - for stdin")
+    import_parser.add_argument(
+        "--tags",
+        default="",
+        help="Space-separated tags to add to every imported link",
+    )
     args = parser.parse_args()
 
     if args.stop:
         sys.exit(stop_server())
+    elif args.command == "import":
+        tags = [t.strip().lstrip("#") for t in args.tags.split() if t.strip()]
+        sys.exit(import_links(args.file, tags))
     else:
         start_server()
 
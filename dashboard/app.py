@@ -10,7 +10,14 @@ from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
 
 from . import db
-from .routers import links, drafts, ai
+from .routers import links, drafts, ai, search, jobs, site
+from .services import claude_client
+from .services.event_bus import event_bus
+from .services.image_optimizer import image_optimizer
+from .services.link_worker import link_worker_pool
+from .services.linklog_index import linklog_index
+from .services.media_store import media_store
+from .services.site_builder import site_builder
 
 DASHBOARD_DIR = Path(__file__).parent
 TEMPLATES_DIR = DASHBOARD_DIR / "templates"
@@ -29,7 +36,21 @@ def parse_json_fields(items: list[dict], fields: list[str]) -> list[dict]:
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     await db.init_db()
-    yield
+    await db.fail_stale_publishes()
+    await linklog_index.sync()
+    await media_store.remove_unreferenced()
+    await claude_client.open_client()
+    await link_worker_pool.start()
+    await site_builder.start()
+    try:
+        yield
+    finally:
+        await link_worker_pool.stop()
+        await event_bus.stop()
+        await site_builder.stop()
+        await image_optimizer.stop()
+        await claude_client.close_client()
+        await db.close_db()
 
 
 app = FastAPI(title="Blog Dashboard", lifespan=lifespan)
@@ -41,28 +62,26 @@ templates = Jinja2Templates(directory=TEMPLATES_DIR)
 app.include_router(links.router, prefix="/api/links", tags=["links"])
 app.include_router(drafts.router, prefix="/api/drafts", tags=["drafts"])
 app.include_router(ai.router, prefix="/api/ai", tags=["ai"])
+app.include_router(search.router, prefix="/api/search", tags=["search"])
+app.include_router(jobs.router, prefix="/api/jobs", tags=["jobs"])
+app.include_router(site.router, prefix="/api/site", tags=["site"])
 
 
 @app.get("/", response_class=HTMLResponse)
 async def index(request: Request):
     """Dashboard home page."""
-    all_links = parse_json_fields(await db.get_links(), ["tags"])
-    all_drafts = parse_json_fields(await db.get_drafts(), ["tags", "ai_analysis"])
-
-    pending_links = sum(1 for link in all_links if link["status"] == "pending")
-    failed_links = sum(1 for link in all_links if link["status"] == "failed")
-    draft_count = sum(1 for draft in all_drafts if draft["status"] == "draft")
+    summary = await db.get_dashboard_summary(recent_limit=5)
 
     return templates.TemplateResponse(
         request,
         "index.html",
         {
             "request": request,
-            "pending_links": pending_links,
-            "failed_links": failed_links,
-            "draft_count": draft_count,
-            "recent_links": all_links[:5],
-            "recent_drafts": all_drafts[:5],
+            "pending_links": summary["link_counts"].get("pending", 0),
+            "failed_links": summary["link_counts"].get("failed", 0),
+            "draft_count": summary["draft_counts"].get("draft", 0),
+            "recent_links": summary["recent_links"],
+            "recent_drafts": summary["recent_drafts"],
         },
     )
 
@@ -70,22 +89,30 @@ async def index(request: Request):
 @app.get("/links", response_class=HTMLResponse)
 async def links_page(request: Request):
     """Link queue management page."""
-    all_links = parse_json_fields(await db.get_links(), ["tags"])
+    links_page, next_cursor = await db.get_links_page()
     return templates.TemplateResponse(
         request,
         "links.html",
-        {"request": request, "links": all_links},
+        {
+            "request": request,
+            "links": parse_json_fields(links_page, ["tags"]),
+            "next_cursor": next_cursor,
+        },
     )
 
 
 @app.get("/drafts", response_class=HTMLResponse)
 async def drafts_page(request: Request):
     """Drafts listing page."""
-    all_drafts = parse_json_fields(await db.get_drafts(), ["tags", "ai_analysis"])
+    drafts_page, next_cursor = await db.get_drafts_page()
     return templates.TemplateResponse(
         request,
         "drafts.html",
-        {"request": request, "drafts": all_drafts},
+        {
+            "request": request,
+            "drafts": parse_json_fields(drafts_page, ["tags"]),
+            "next_cursor": next_cursor,
+        },
     )
 
 
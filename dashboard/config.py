@@ -9,11 +9,78 @@ DATABASE_PATH = PROJECT_ROOT / "dashboard.db"
 PID_FILE = PROJECT_ROOT / ".write.pid"
 BLOG_DIR = PROJECT_ROOT / "src" / "blog"
 MEDIA_DIR = PROJECT_ROOT / "src" / "_11ty" / "_static" / "img"
+# Media being written, kept out of git and the site until complete. On the
+# same filesystem as MEDIA_DIR, so finished files move into place atomically.
+MEDIA_TMP_DIR = PROJECT_ROOT / ".media-tmp"
 LLOG_SCRIPT = PROJECT_ROOT / "llog.js"
+SITE_BUILDER_SCRIPT = PROJECT_ROOT / "eleventy-builder.mjs"
+LINKLOG_FILE = PROJECT_ROOT / "src" / "_11ty" / "_data" / "linklog.json"
+
+DB_READER_POOL_SIZE = int(os.environ.get("DASHBOARD_DB_READERS", "4"))
+PAGE_SIZE = 50
+SEARCH_LIMIT = 20
+
+LINK_WORKERS = int(os.environ.get("DASHBOARD_LINK_WORKERS", "3"))
+LINK_POLL_INTERVAL = 30.0
+LINK_BATCH_SIZE = int(os.environ.get("DASHBOARD_LINK_BATCH_SIZE", "10"))
+LINK_BATCH_WINDOW = float(os.environ.get("DASHBOARD_LINK_BATCH_WINDOW", "5"))
+# Progress events kept per job for late subscribers, and finished jobs kept
+JOB_EVENT_BUFFER = 500
+JOB_HISTORY = 20
+
+# Claude API client: connection pool, timeouts (seconds), concurrent
+# requests per analysis, and retries of rate-limited or overloaded calls
+CLAUDE_API_URL = os.environ.get(
+    "DASHBOARD_CLAUDE_API_URL", "https://api.anthropic.com/v1/messages"
+)
+AI_HTTP_MAX_CONNECTIONS = int(os.environ.get("DASHBOARD_CLAUDE_CONNECTIONS", "10"))
+AI_HTTP_KEEPALIVE_EXPIRY = float(os.environ.get("DASHBOARD_CLAUDE_KEEPALIVE", "30"))
+AI_HTTP_CONNECT_TIMEOUT = float(os.environ.get("DASHBOARD_CLAUDE_CONNECT_TIMEOUT", "10"))
+AI_HTTP_READ_TIMEOUT = float(os.environ.get("DASHBOARD_CLAUDE_READ_TIMEOUT", "60"))
+AI_MAX_CONCURRENCY = int(os.environ.get("DASHBOARD_CLAUDE_CONCURRENCY", "5"))
+AI_MAX_RETRIES = int(os.environ.get("DASHBOARD_CLAUDE_RETRIES", "4"))
+AI_RETRY_BASE_DELAY = float(os.environ.get("DASHBOARD_CLAUDE_RETRY_DELAY", "1"))
+AI_RETRY_MAX_DELAY = float(os.environ.get("DASHBOARD_CLAUDE_RETRY_MAX_DELAY", "30"))
+AI_CACHE_MAX_ENTRIES = 5000
+AI_CACHE_MAX_AGE_DAYS = 90
+# Incremental analysis re-runs a paragraph when any of this many preceding
+# paragraphs changed; edits further back keep the previous analysis
+AI_CONTEXT_WINDOW = int(os.environ.get("DASHBOARD_AI_CONTEXT_WINDOW", "2"))
+
+# Draft revision history: at most one revision per interval while editing,
+# compacted to everything from the last hour, then hourly for a day, then
+# daily up to the age limit
+REVISION_INTERVAL = float(os.environ.get("DASHBOARD_REVISION_INTERVAL", "60"))
+REVISION_KEYFRAME_EVERY = 20
+REVISION_KEEP_ALL_HOURS = 1
+REVISION_KEEP_HOURLY_DAYS = 1
+REVISION_KEEP_DAILY_DAYS = 90
+
+# Responsive variants of uploaded images, built in worker processes when
+# Pillow is installed. IMAGE_SIZES matches the article column width.
+IMAGE_WORKERS = int(os.environ.get("DASHBOARD_IMAGE_WORKERS", "2"))
+IMAGE_WIDTHS = (480, 960, 1600)
+IMAGE_QUALITY = 80
+IMAGE_SIZES = "(max-width: 760px) 100vw, 700px"
+
+# Warm Eleventy process for incremental site builds; set to 0 to always run
+# a full build. The builder gives up on a build after SITE_BUILD_TIMEOUT and
+# signals it is alive every SITE_BUILDER_HEARTBEAT while busy; after
+# SITE_BUILDER_STALL_TIMEOUT without a word it is restarted.
+SITE_BUILDER = os.environ.get("DASHBOARD_SITE_BUILDER", "1") != "0"
+SITE_BUILD_TIMEOUT = 120.0
+SITE_BUILDER_HEARTBEAT = 5.0
+SITE_BUILDER_STALL_TIMEOUT = 20.0
 
 HOST = "127.0.0.1"
 PORT = 8888
 
+# Where llog.js reaches the warm builder. Set it when the dashboard listens
+# somewhere other than HOST:PORT, e.g. under uvicorn --host/--port.
+SITE_BUILD_URL = os.environ.get(
+    "DASHBOARD_SITE_BUILD_URL", f"http://{HOST}:{PORT}/api/site/build"
+)
+
 
 def load_config_file() -> dict[str, str]:
     """Load config from ~/llog.conf (same format as llog.js uses)."""
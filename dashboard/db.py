@@ -1,18 +1,38 @@
 """Database operations for the blog dashboard."""
 
+import asyncio
+import base64
+import difflib
 import json
-from datetime import datetime
-from typing import Optional
+import re
+import zlib
+from contextlib import asynccontextmanager
+from datetime import datetime, timedelta
+from typing import AsyncIterator, Optional
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
 
 import aiosqlite
 
-from .config import DATABASE_PATH
+from .config import (
+    DATABASE_PATH,
+    DB_READER_POOL_SIZE,
+    PAGE_SIZE,
+    REVISION_INTERVAL,
+    REVISION_KEEP_ALL_HOURS,
+    REVISION_KEEP_DAILY_DAYS,
+    REVISION_KEEP_HOURLY_DAYS,
+    REVISION_KEYFRAME_EVERY,
+    SEARCH_LIMIT,
+)
 
 SCHEMA = """
 CREATE TABLE IF NOT EXISTS link_queue (
     id INTEGER PRIMARY KEY AUTOINCREMENT,
     url TEXT NOT NULL UNIQUE,
+    canonical_url TEXT,
     tags TEXT,
+    stage TEXT,
+    prepared_entry TEXT,
     status TEXT DEFAULT 'pending',
     error_message TEXT,
     error_output TEXT,
@@ -32,44 +52,529 @@ CREATE TABLE IF NOT EXISTS drafts (
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
     updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
     published_at TIMESTAMP,
-    published_path TEXT
+    published_path TEXT,
+    version INTEGER NOT NULL DEFAULT 0,
+    publish_status TEXT,
+    publish_stage TEXT,
+    publish_error TEXT,
+    publish_job_id TEXT
 );
 
+CREATE TABLE IF NOT EXISTS analysis_cache (
+    key TEXT PRIMARY KEY,
+    result TEXT NOT NULL,
+    hits INTEGER DEFAULT 0,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    last_used_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE TABLE IF NOT EXISTS draft_revisions (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    draft_id INTEGER NOT NULL REFERENCES drafts(id) ON DELETE CASCADE,
+    version INTEGER NOT NULL,
+    base_id INTEGER,
+    depth INTEGER NOT NULL DEFAULT 0,
+    data BLOB NOT NULL,
+    size INTEGER NOT NULL,
+    created_at TIMESTAMP NOT NULL
+);
+
+-- Uploaded media, stored once per distinct content. hash is the SHA-256
+-- of the uploaded bytes; ref_count is kept in step with media_refs by
+-- triggers, and published files are kept even when nothing refers to them.
+-- A draft refers to a file once it uploads it or its content links to it.
+CREATE TABLE IF NOT EXISTS media_files (
+    hash TEXT PRIMARY KEY,
+    filename TEXT NOT NULL UNIQUE,
+    media_type TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    ref_count INTEGER NOT NULL DEFAULT 0,
+    published INTEGER NOT NULL DEFAULT 0,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE TABLE IF NOT EXISTS media_refs (
+    hash TEXT NOT NULL REFERENCES media_files(hash) ON DELETE CASCADE,
+    draft_id INTEGER NOT NULL REFERENCES drafts(id) ON DELETE CASCADE,
+    PRIMARY KEY (hash, draft_id)
+);
+
+-- Resized and re-encoded copies of a stored image, all without metadata.
+-- One in the source format is kept at the image's own width; the stored
+-- file itself is never rewritten, so it still matches its hash.
+CREATE TABLE IF NOT EXISTS image_variants (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    hash TEXT NOT NULL REFERENCES media_files(hash) ON DELETE CASCADE,
+    filename TEXT NOT NULL UNIQUE,
+    media_type TEXT NOT NULL,
+    width INTEGER NOT NULL,
+    height INTEGER NOT NULL,
+    size INTEGER NOT NULL,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE VIRTUAL TABLE IF NOT EXISTS drafts_fts USING fts5(
+    title, description, content,
+    content = 'drafts', content_rowid = 'id',
+    tokenize = 'porter unicode61 remove_diacritics 2'
+);
+
+CREATE VIRTUAL TABLE IF NOT EXISTS link_queue_fts USING fts5(
+    url, tags,
+    content = 'link_queue', content_rowid = 'id',
+    tokenize = 'porter unicode61 remove_diacritics 2'
+);
+
+CREATE TABLE IF NOT EXISTS linklog_entries (
+    id TEXT PRIMARY KEY,
+    url TEXT NOT NULL,
+    normalized_url TEXT NOT NULL,
+    title TEXT,
+    summary TEXT,
+    tags TEXT,
+    date_added TEXT
+);
+
+-- Rebuilt wholesale whenever linklog_entries is reloaded, so no triggers
+CREATE VIRTUAL TABLE IF NOT EXISTS linklog_entries_fts USING fts5(
+    title, summary, tags,
+    content = 'linklog_entries',
+    tokenize = 'porter unicode61 remove_diacritics 2'
+);
+
+CREATE TRIGGER IF NOT EXISTS drafts_fts_insert AFTER INSERT ON drafts BEGIN
+    INSERT INTO drafts_fts (rowid, title, description, content)
+    VALUES (new.id, new.title, new.description, new.content);
+END;
+CREATE TRIGGER IF NOT EXISTS drafts_fts_delete AFTER DELETE ON drafts BEGIN
+    INSERT INTO drafts_fts (drafts_fts, rowid, title, description, content)
+    VALUES ('delete', old.id, old.title, old.description, old.content);
+END;
+CREATE TRIGGER IF NOT EXISTS drafts_fts_update
+AFTER UPDATE OF title, description, content ON drafts BEGIN
+    INSERT INTO drafts_fts (drafts_fts, rowid, title, description, content)
+    VALUES ('delete', old.id, old.title, old.description, old.content);
+    INSERT INTO drafts_fts (rowid, title, description, content)
+    VALUES (new.id, new.title, new.description, new.content);
+END;
+
+CREATE TRIGGER IF NOT EXISTS media_refs_insert AFTER INSERT ON media_refs BEGIN
+    UPDATE media_files SET ref_count = ref_count + 1 WHERE hash = new.hash;
+END;
+CREATE TRIGGER IF NOT EXISTS media_refs_delete AFTER DELETE ON media_refs BEGIN
+    UPDATE media_files SET ref_count = ref_count - 1 WHERE hash = old.hash;
+END;
+
+CREATE TRIGGER IF NOT EXISTS link_queue_fts_insert AFTER INSERT ON link_queue BEGIN
+    INSERT INTO link_queue_fts (rowid, url, tags) VALUES (new.id, new.url, new.tags);
+END;
+CREATE TRIGGER IF NOT EXISTS link_queue_fts_delete AFTER DELETE ON link_queue BEGIN
+    INSERT INTO link_queue_fts (link_queue_fts, rowid, url, tags)
+    VALUES ('delete', old.id, old.url, old.tags);
+END;
+CREATE TRIGGER IF NOT EXISTS link_queue_fts_update
+AFTER UPDATE OF url, tags ON link_queue BEGIN
+    INSERT INTO link_queue_fts (link_queue_fts, rowid, url, tags)
+    VALUES ('delete', old.id, old.url, old.tags);
+    INSERT INTO link_queue_fts (rowid, url, tags) VALUES (new.id, new.url, new.tags);
+END;
+
 CREATE INDEX IF NOT EXISTS idx_link_queue_status ON link_queue(status);
 CREATE INDEX IF NOT EXISTS idx_drafts_status ON drafts(status);
+CREATE INDEX IF NOT EXISTS idx_link_queue_created ON link_queue(created_at, id);
+CREATE INDEX IF NOT EXISTS idx_drafts_updated ON drafts(updated_at, id);
+CREATE INDEX IF NOT EXISTS idx_link_queue_status_created ON link_queue(status, created_at, id);
+CREATE INDEX IF NOT EXISTS idx_drafts_status_updated ON drafts(status, updated_at, id);
+CREATE INDEX IF NOT EXISTS idx_analysis_cache_last_used ON analysis_cache(last_used_at);
+CREATE INDEX IF NOT EXISTS idx_draft_revisions_draft ON draft_revisions(draft_id, id);
+CREATE INDEX IF NOT EXISTS idx_linklog_entries_url ON linklog_entries(normalized_url);
+CREATE INDEX IF NOT EXISTS idx_media_refs_draft ON media_refs(draft_id);
+CREATE INDEX IF NOT EXISTS idx_image_variants_hash ON image_variants(hash);
 """
 
+# Columns added after a table was first created: (table, column, definition).
+# Fresh databases get them from SCHEMA; older ones are altered on startup.
+MIGRATIONS = [
+    ("drafts", "version", "INTEGER NOT NULL DEFAULT 0"),
+    ("link_queue", "canonical_url", "TEXT"),
+    ("link_queue", "stage", "TEXT"),
+    ("link_queue", "prepared_entry", "TEXT"),
+    ("drafts", "publish_status", "TEXT"),
+    ("drafts", "publish_stage", "TEXT"),
+    ("drafts", "publish_error", "TEXT"),
+    ("drafts", "publish_job_id", "TEXT"),
+]
+
+# Indexes on MIGRATIONS columns, created once the columns exist
+MIGRATED_INDEXES = """
+CREATE UNIQUE INDEX IF NOT EXISTS idx_link_queue_canonical_url ON link_queue(canonical_url);
+"""
+
+
+LINK_SUMMARY_COLUMNS = (
+    "id", "url", "tags", "status", "stage", "error_message", "created_at", "processed_at"
+)
+DRAFT_SUMMARY_COLUMNS = (
+    "id", "title", "description", "tags", "status",
+    "created_at", "updated_at", "published_at", "published_path", "version",
+    "publish_status",
+)
+
+# Full-text indexes that mirror an existing table through triggers. They are
+# rebuilt from that table when first created on an existing database.
+EXTERNAL_FTS_TABLES = ("drafts_fts", "link_queue_fts")
+
+PRAGMAS = (
+    "PRAGMA journal_mode = WAL",
+    "PRAGMA synchronous = NORMAL",
+    "PRAGMA foreign_keys = ON",
+    "PRAGMA busy_timeout = 5000",
+    "PRAGMA temp_store = MEMORY",
+    "PRAGMA cache_size = -8000",
+    "PRAGMA mmap_size = 67108864",
+)
+
+
+class DraftVersionConflict(Exception):
+    """A draft edit was based on a version that is no longer current."""
+
+    def __init__(self, current_version: int):
+        super().__init__(f"Draft is at version {current_version}")
+        self.current_version = current_version
+
+
+class ConnectionPool:
+    """Long-lived SQLite connections: one shared writer and a pool of readers.
+
+    WAL mode lets readers run concurrently with the single writer, so reads
+    never queue behind an autosave. Writes are serialised with a lock and
+    committed (or rolled back) when the ``write()`` block exits.
+    """
+
+    def __init__(self, path=DATABASE_PATH, readers: int = DB_READER_POOL_SIZE):
+        self.path = path
+        self.reader_count = max(1, readers)
+        self._writer: aiosqlite.Connection | None = None
+        self._write_lock = asyncio.Lock()
+        self._readers: asyncio.Queue[aiosqlite.Connection] = asyncio.Queue()
+        self._all_readers: list[aiosqlite.Connection] = []
+
+    async def _connect(self, read_only: bool = False) -> aiosqlite.Connection:
+        conn = await aiosqlite.connect(self.path)
+        conn.row_factory = aiosqlite.Row
+        for pragma in PRAGMAS:
+            await conn.execute(pragma)
+        if read_only:
+            await conn.execute("PRAGMA query_only = ON")
+        return conn
 
-async def get_db() -> aiosqlite.Connection:
-    """Get a database connection."""
-    db = await aiosqlite.connect(DATABASE_PATH)
-    db.row_factory = aiosqlite.Row
-    return db
+    async def _migrate(self, conn: aiosqlite.Connection):
+        """Add any MIGRATIONS columns missing from an existing database."""
+        for table, column, definition in MIGRATIONS:
+            cursor = await conn.execute(f"PRAGMA table_info({table})")
+            existing = {row["name"] for row in await cursor.fetchall()}
+            if column not in existing:
+                await conn.execute(f"ALTER TABLE {table} ADD COLUMN {column} {definition}")
+
+    async def _backfill_canonical_urls(self, conn: aiosqlite.Connection):
+        """Fill in canonical_url for links queued before the column existed.
+
+        If several old rows share a canonical URL only the oldest gets it;
+        the others stay NULL, which the unique index allows.
+        """
+        cursor = await conn.execute(
+            "SELECT id, url FROM link_queue WHERE canonical_url IS NULL ORDER BY id"
+        )
+        rows = await cursor.fetchall()
+        if not rows:
+            return
+        cursor = await conn.execute(
+            "SELECT canonical_url FROM link_queue WHERE canonical_url IS NOT NULL"
+        )
+        taken = {row["canonical_url"] for row in await cursor.fetchall()}
+        updates = []
+        for row in rows:
+            canonical = normalize_url(row["url"])
+            if canonical not in taken:
+                taken.add(canonical)
+                updates.append((canonical, row["id"]))
+        await conn.executemany(
+            "UPDATE link_queue SET canonical_url = ? WHERE id = ?", updates
+        )
+
+    async def open(self):
+        """Open the writer (applying the schema) and the reader pool."""
+        self._writer = await self._connect()
+        cursor = await self._writer.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'table'"
+        )
+        existing = {row["name"] for row in await cursor.fetchall()}
+        await self._writer.executescript(SCHEMA)
+        await self._migrate(self._writer)
+        await self._backfill_canonical_urls(self._writer)
+        await self._writer.executescript(MIGRATED_INDEXES)
+        for table in EXTERNAL_FTS_TABLES:
+            if table not in existing:
+                await self._writer.execute(
+                    f"INSERT INTO {table} ({table}) VALUES ('rebuild')"
+                )
+        await self._writer.commit()
+
+        for _ in range(self.reader_count):
+            conn = await self._connect(read_only=True)
+            self._all_readers.append(conn)
+            self._readers.put_nowait(conn)
+
+    async def close(self):
+        """Close every connection owned by the pool."""
+        for conn in self._all_readers:
+            await conn.close()
+        self._all_readers.clear()
+        self._readers = asyncio.Queue()
+
+        if self._writer is not None:
+            await self._writer.close()
+            self._writer = None
+
+    @asynccontextmanager
+    async def read(self) -> AsyncIterator[aiosqlite.Connection]:
+        """Borrow a reader connection for the duration of the block."""
+        conn = await self._readers.get()
+        try:
+            yield conn
+        finally:
+            self._readers.put_nowait(conn)
+
+    @asynccontextmanager
+    async def write(self) -> AsyncIterator[aiosqlite.Connection]:
+        """Hold the writer for one transaction, committing on success."""
+        async with self._write_lock:
+            try:
+                yield self._writer
+            except BaseException:
+                await self._writer.rollback()
+                raise
+            else:
+                await self._writer.commit()
+
+
+_pool: ConnectionPool | None = None
+
+
+def _get_pool() -> ConnectionPool:
+    if _pool is None:
+        raise RuntimeError("Database is not initialised; call init_db() first")
+    return _pool
+
+
+def _reader():
+    return _get_pool().read()
+
+
+def _writer():
+    return _get_pool().write()
 
 
 async def init_db():
-    """Initialize the database with schema."""
-    async with aiosqlite.connect(DATABASE_PATH) as db:
-        await db.executescript(SCHEMA)
-        await db.commit()
+    """Open the shared connection pool and apply the schema."""
+    global _pool
+    if _pool is not None:
+        return
+    pool = ConnectionPool()
+    await pool.open()
+    _pool = pool
+
+
+async def close_db():
+    """Close the shared connection pool."""
+    global _pool
+    if _pool is not None:
+        await _pool.close()
+        _pool = None
+
+
+# Keyset pagination
+def encode_cursor(sort_value: str, row_id: int) -> str:
+    """Encode a (sort key, id) position as an opaque URL-safe cursor."""
+    raw = json.dumps([sort_value, row_id]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> tuple[str, int]:
+    """Decode a cursor from encode_cursor(). Raises ValueError if malformed."""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        sort_value, row_id = json.loads(base64.urlsafe_b64decode(padded))
+    except Exception as e:
+        raise ValueError(f"Invalid cursor: {cursor!r}") from e
+    if not isinstance(sort_value, str) or not isinstance(row_id, int):
+        raise ValueError(f"Invalid cursor: {cursor!r}")
+    return sort_value, row_id
+
+
+async def _fetch_page(
+    table: str,
+    columns: tuple[str, ...] | None,
+    sort_column: str,
+    status: Optional[str],
+    cursor: Optional[str],
+    limit: int,
+) -> tuple[list[dict], Optional[str]]:
+    """Fetch one page ordered by (sort_column, id) descending.
+
+    Returns the rows and the cursor for the next page (None on the last page).
+    """
+    where = []
+    params: list = []
+    if status:
+        where.append("status = ?")
+        params.append(status)
+    if cursor:
+        where.append(f"({sort_column}, id) < (?, ?)")
+        params.extend(decode_cursor(cursor))
+
+    selected = ", ".join(columns) if columns else "*"
+    sql = f"SELECT {selected} FROM {table}"
+    if where:
+        sql += " WHERE " + " AND ".join(where)
+    sql += f" ORDER BY {sort_column} DESC, id DESC LIMIT ?"
+    params.append(limit + 1)
+
+    async with _reader() as db:
+        result = await db.execute(sql, params)
+        rows = [dict(row) for row in await result.fetchall()]
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        next_cursor = encode_cursor(last[sort_column], last["id"])
+    return rows, next_cursor
+
+
+async def get_links_page(
+    status: Optional[str] = None,
+    cursor: Optional[str] = None,
+    limit: int = PAGE_SIZE,
+) -> tuple[list[dict], Optional[str]]:
+    """Get one page of links, newest first, as summary rows."""
+    return await _fetch_page(
+        "link_queue", LINK_SUMMARY_COLUMNS, "created_at", status, cursor, limit
+    )
+
+
+async def get_drafts_page(
+    status: Optional[str] = None,
+    cursor: Optional[str] = None,
+    limit: int = PAGE_SIZE,
+    full: bool = False,
+) -> tuple[list[dict], Optional[str]]:
+    """Get one page of drafts, most recently updated first.
+
+    Unless ``full`` is set, content and AI analysis are left out.
+    """
+    columns = None if full else DRAFT_SUMMARY_COLUMNS
+    return await _fetch_page("drafts", columns, "updated_at", status, cursor, limit)
+
+
+# Dashboard summary
+async def get_dashboard_summary(recent_limit: int = 5) -> dict:
+    """Get status counts and the most recent links and drafts.
+
+    Counts are grouped in SQL and the recent rows only carry the columns the
+    home page renders, so the cost does not grow with draft size or count.
+    """
+    async with _reader() as db:
+        cursor = await db.execute(
+            "SELECT status, COUNT(*) AS n FROM link_queue GROUP BY status"
+        )
+        link_counts = {row["status"]: row["n"] for row in await cursor.fetchall()}
+
+        cursor = await db.execute(
+            "SELECT status, COUNT(*) AS n FROM drafts GROUP BY status"
+        )
+        draft_counts = {row["status"]: row["n"] for row in await cursor.fetchall()}
+
+        cursor = await db.execute(
+            """SELECT id, url, status FROM link_queue
+               ORDER BY created_at DESC, id DESC LIMIT ?""",
+            (recent_limit,),
+        )
+        recent_links = [dict(row) for row in await cursor.fetchall()]
+
+        cursor = await db.execute(
+            """SELECT id, title, status FROM drafts
+               ORDER BY updated_at DESC, id DESC LIMIT ?""",
+            (recent_limit,),
+        )
+        recent_drafts = [dict(row) for row in await cursor.fetchall()]
+
+    return {
+        "link_counts": link_counts,
+        "draft_counts": draft_counts,
+        "recent_links": recent_links,
+        "recent_drafts": recent_drafts,
+    }
 
 
 # Link queue operations
+
+def normalize_url(url: str) -> str:
+    """Reduce a URL to the canonical form used to spot duplicates.
+
+    The scheme and host are lower-cased, http is treated as https, and the
+    default port, fragment, trailing slash and utm_* parameters are dropped.
+    """
+    parts = urlsplit(url.strip())
+    scheme = parts.scheme.lower()
+    if scheme == "http":
+        scheme = "https"
+    netloc = parts.netloc.lower()
+    if netloc.endswith(":443") or netloc.endswith(":80"):
+        netloc = netloc.rsplit(":", 1)[0]
+    path = parts.path.rstrip("/")
+    query = parts.query
+    params = parse_qsl(query, keep_blank_values=True)
+    kept = [(key, value) for key, value in params if not key.lower().startswith("utm_")]
+    if len(kept) != len(params):
+        query = urlencode(kept)
+    return urlunsplit((scheme, netloc, path, query, ""))
+
 async def add_link(url: str, tags: list[str]) -> int:
-    """Add a link to the queue. Returns the new link ID."""
-    async with aiosqlite.connect(DATABASE_PATH) as db:
+    """Add a link to the queue. Returns the new link ID.
+
+    Raises sqlite3.IntegrityError if the URL, or another form of it with
+    the same canonical URL, is already queued.
+    """
+    async with _writer() as db:
         cursor = await db.execute(
-            "INSERT INTO link_queue (url, tags) VALUES (?, ?)",
-            (url, json.dumps(tags)),
+            "INSERT INTO link_queue (url, canonical_url, tags) VALUES (?, ?, ?)",
+            (url, normalize_url(url), json.dumps(tags)),
         )
-        await db.commit()
         return cursor.lastrowid
 
 
+async def add_links(links: list[tuple[str, list[str]]]) -> int:
+    """Queue many (url, tags) links in one transaction.
+
+    Links already queued under the same canonical URL, or already published
+    in the linklog, are skipped. Returns the number of links inserted.
+    """
+    async with _writer() as db:
+        cursor = await db.executemany(
+            """INSERT OR IGNORE INTO link_queue (url, canonical_url, tags)
+               SELECT ?1, ?2, ?3
+               WHERE NOT EXISTS (
+                   SELECT 1 FROM linklog_entries WHERE normalized_url = ?2
+               )""",
+            [(url, normalize_url(url), json.dumps(tags)) for url, tags in links],
+        )
+        return max(cursor.rowcount, 0)
+
+
 async def get_links(status: Optional[str] = None) -> list[dict]:
     """Get all links, optionally filtered by status."""
-    async with aiosqlite.connect(DATABASE_PATH) as db:
-        db.row_factory = aiosqlite.Row
+    async with _reader() as db:
         if status:
             cursor = await db.execute(
                 "SELECT * FROM link_queue WHERE status = ? ORDER BY created_at DESC",
@@ -85,8 +590,7 @@ async def get_links(status: Optional[str] = None) -> list[dict]:
 
 async def get_link(link_id: int) -> Optional[dict]:
     """Get a single link by ID."""
-    async with aiosqlite.connect(DATABASE_PATH) as db:
-        db.row_factory = aiosqlite.Row
+    async with _reader() as db:
         cursor = await db.execute("SELECT * FROM link_queue WHERE id = ?", (link_id,))
         row = await cursor.fetchone()
         return dict(row) if row else None
@@ -99,7 +603,7 @@ async def update_link_status(
     error_output: Optional[str] = None,
 ):
     """Update a link's status."""
-    async with aiosqlite.connect(DATABASE_PATH) as db:
+    async with _writer() as db:
         processed_at = datetime.now().isoformat() if status in ("completed", "failed") else None
         await db.execute(
             """UPDATE link_queue
@@ -107,20 +611,35 @@ async def update_link_status(
                WHERE id = ?""",
             (status, error_message, error_output, processed_at, link_id),
         )
-        await db.commit()
+
+
+async def update_link_stage(link_ids: list[int], stage: Optional[str]):
+    """Record the pipeline stage that links have reached."""
+    async with _writer() as db:
+        await db.executemany(
+            "UPDATE link_queue SET stage = ? WHERE id = ?",
+            [(stage, link_id) for link_id in link_ids],
+        )
+
+
+async def save_prepared_entry(link_id: int, entry: dict, stage: str):
+    """Checkpoint a link's prepared linklog entry so retries can reuse it."""
+    async with _writer() as db:
+        await db.execute(
+            "UPDATE link_queue SET prepared_entry = ?, stage = ? WHERE id = ?",
+            (json.dumps(entry), stage, link_id),
+        )
 
 
 async def delete_link(link_id: int):
     """Delete a link from the queue."""
-    async with aiosqlite.connect(DATABASE_PATH) as db:
+    async with _writer() as db:
         await db.execute("DELETE FROM link_queue WHERE id = ?", (link_id,))
-        await db.commit()
 
 
 async def get_next_pending_link() -> Optional[dict]:
     """Get the next pending link (oldest first)."""
-    async with aiosqlite.connect(DATABASE_PATH) as db:
-        db.row_factory = aiosqlite.Row
+    async with _reader() as db:
         cursor = await db.execute(
             "SELECT * FROM link_queue WHERE status = 'pending' ORDER BY created_at ASC LIMIT 1"
         )
@@ -128,22 +647,44 @@ async def get_next_pending_link() -> Optional[dict]:
         return dict(row) if row else None
 
 
+async def claim_next_pending_link() -> Optional[dict]:
+    """Atomically move the oldest pending link to 'processing' and return it."""
+    async with _writer() as db:
+        cursor = await db.execute(
+            """UPDATE link_queue SET status = 'processing'
+               WHERE id = (
+                   SELECT id FROM link_queue WHERE status = 'pending'
+                   ORDER BY created_at ASC, id ASC LIMIT 1
+               )
+               RETURNING *"""
+        )
+        row = await cursor.fetchone()
+        return dict(row) if row else None
+
+
+async def requeue_stale_links() -> int:
+    """Return links left in 'processing' by a previous run to the queue."""
+    async with _writer() as db:
+        cursor = await db.execute(
+            "UPDATE link_queue SET status = 'pending' WHERE status = 'processing'"
+        )
+        return cursor.rowcount
+
+
 # Draft operations
 async def create_draft(title: str) -> int:
     """Create a new draft. Returns the new draft ID."""
-    async with aiosqlite.connect(DATABASE_PATH) as db:
+    async with _writer() as db:
         cursor = await db.execute(
             "INSERT INTO drafts (title) VALUES (?)",
             (title,),
         )
-        await db.commit()
         return cursor.lastrowid
 
 
 async def get_drafts(status: Optional[str] = None) -> list[dict]:
     """Get all drafts, optionally filtered by status."""
-    async with aiosqlite.connect(DATABASE_PATH) as db:
-        db.row_factory = aiosqlite.Row
+    async with _reader() as db:
         if status:
             cursor = await db.execute(
                 "SELECT * FROM drafts WHERE status = ? ORDER BY updated_at DESC",
@@ -157,8 +698,7 @@ async def get_drafts(status: Optional[str] = None) -> list[dict]:
 
 async def get_draft(draft_id: int) -> Optional[dict]:
     """Get a single draft by ID."""
-    async with aiosqlite.connect(DATABASE_PATH) as db:
-        db.row_factory = aiosqlite.Row
+    async with _reader() as db:
         cursor = await db.execute("SELECT * FROM drafts WHERE id = ?", (draft_id,))
         row = await cursor.fetchone()
         return dict(row) if row else None
@@ -174,7 +714,12 @@ async def update_draft(
     ai_analysis: Optional[list] = None,
 ):
     """Update a draft's fields."""
-    async with aiosqlite.connect(DATABASE_PATH) as db:
+    if content is not None:
+        # Form posts arrive with CRLF line endings, while the editor's
+        # PATCH offsets count the LF text it holds
+        content = content.replace("\r\n", "\n")
+
+    async with _writer() as db:
         updates = []
         params = []
 
@@ -189,6 +734,7 @@ async def update_draft(
             params.append(json.dumps(tags))
         if content is not None:
             updates.append("content = ?")
+            updates.append("version = version + 1")
             params.append(content)
         if audience_notes is not None:
             updates.append("audience_notes = ?")
@@ -202,27 +748,708 @@ async def update_draft(
             params.append(datetime.now().isoformat())
             params.append(draft_id)
 
-            await db.execute(
-                f"UPDATE drafts SET {', '.join(updates)} WHERE id = ?",
+            cursor = await db.execute(
+                f"UPDATE drafts SET {', '.join(updates)} WHERE id = ? RETURNING version",
                 params,
             )
-            await db.commit()
+            row = await cursor.fetchone()
+            if row and content is not None:
+                await _record_revision(db, draft_id, content, row["version"])
+                await _add_content_media_refs(db, draft_id, content)
+
+
+def apply_text_edits(content: str, edits: list[dict]) -> str:
+    """Apply {start, end, text} splices to content, in order.
+
+    Offsets count UTF-16 code units, as JavaScript string indexes do, so
+    edits computed in the browser line up even around emoji.
+    """
+    units = content.encode("utf-16-le", "surrogatepass")
+    for edit in edits:
+        start, end = edit["start"], edit["end"]
+        if not 0 <= start <= end <= len(units) // 2:
+            raise ValueError(f"Edit [{start}, {end}) is out of range")
+        text = edit.get("text", "").encode("utf-16-le", "surrogatepass")
+        units = units[: start * 2] + text + units[end * 2 :]
+    return units.decode("utf-16-le", "surrogatepass")
+
+
+async def patch_draft(
+    draft_id: int,
+    base_version: int,
+    edits: list[dict],
+    expected_length: Optional[int] = None,
+    **fields: Optional[str],
+) -> Optional[int]:
+    """Apply content edits made against base_version, plus any plain fields.
+
+    Runs in a single write transaction. Returns the new version, or None if
+    the draft does not exist. Raises DraftVersionConflict if the draft has
+    moved on, and ValueError if the edits do not fit the stored content or
+    the result does not have the expected UTF-16 length.
+    """
+    async with _writer() as db:
+        cursor = await db.execute(
+            "SELECT content, version FROM drafts WHERE id = ?", (draft_id,)
+        )
+        row = await cursor.fetchone()
+        if not row:
+            return None
+        if row["version"] != base_version:
+            raise DraftVersionConflict(row["version"])
+
+        updates = [f"{name} = ?" for name, value in fields.items() if value is not None]
+        params: list = [value for value in fields.values() if value is not None]
+
+        version = row["version"]
+        if edits:
+            content = apply_text_edits(row["content"] or "", edits)
+            length = len(content.encode("utf-16-le", "surrogatepass")) // 2
+            if expected_length is not None and length != expected_length:
+                raise ValueError("Edited content does not have the expected length")
+            version += 1
+            updates += ["content = ?", "version = ?"]
+            params += [content, version]
+
+        if updates:
+            updates.append("updated_at = ?")
+            params += [datetime.now().isoformat(), draft_id]
+            await db.execute(
+                f"UPDATE drafts SET {', '.join(updates)} WHERE id = ?", params
+            )
+        if edits:
+            await _record_revision(db, draft_id, content, version)
+            await _add_content_media_refs(db, draft_id, content)
+        return version
 
 
 async def mark_draft_published(draft_id: int, published_path: str):
     """Mark a draft as published."""
-    async with aiosqlite.connect(DATABASE_PATH) as db:
+    async with _writer() as db:
         await db.execute(
             """UPDATE drafts
-               SET status = 'published', published_at = ?, published_path = ?, updated_at = ?
+               SET status = 'published', published_at = ?, published_path = ?, updated_at = ?,
+                   publish_status = 'published', publish_stage = NULL, publish_error = NULL
                WHERE id = ?""",
             (datetime.now().isoformat(), published_path, datetime.now().isoformat(), draft_id),
         )
-        await db.commit()
+
+
+async def queue_draft_publish(draft_id: int) -> bool:
+    """Mark a draft as queued for publishing.
+
+    Returns False if the draft is already queued or being published.
+    """
+    async with _writer() as db:
+        cursor = await db.execute(
+            """UPDATE drafts
+               SET publish_status = 'queued', publish_stage = NULL, publish_error = NULL,
+                   publish_job_id = NULL
+               WHERE id = ? AND COALESCE(publish_status, '') NOT IN ('queued', 'publishing')""",
+            (draft_id,),
+        )
+        return cursor.rowcount > 0
+
+
+async def set_draft_publish_job(draft_id: int, job_id: str):
+    """Record which job is publishing a draft, so clients can follow it."""
+    async with _writer() as db:
+        await db.execute(
+            "UPDATE drafts SET publish_job_id = ? WHERE id = ?", (job_id, draft_id)
+        )
+
+
+async def update_draft_publish(
+    draft_id: int,
+    status: str,
+    stage: Optional[str] = None,
+    error: Optional[str] = None,
+):
+    """Record the progress of a draft's publish job."""
+    async with _writer() as db:
+        await db.execute(
+            """UPDATE drafts SET publish_status = ?, publish_stage = ?, publish_error = ?
+               WHERE id = ?""",
+            (status, stage, error, draft_id),
+        )
+
+
+async def fail_stale_publishes() -> int:
+    """Fail publish jobs a previous run left queued or in progress."""
+    async with _writer() as db:
+        cursor = await db.execute(
+            """UPDATE drafts
+               SET publish_status = 'failed', publish_error = 'Interrupted by a restart'
+               WHERE publish_status IN ('queued', 'publishing')"""
+        )
+        return cursor.rowcount
 
 
 async def delete_draft(draft_id: int):
     """Delete a draft."""
-    async with aiosqlite.connect(DATABASE_PATH) as db:
+    async with _writer() as db:
         await db.execute("DELETE FROM drafts WHERE id = ?", (draft_id,))
-        await db.commit()
+
+
+# Draft revisions
+#
+# Each revision stores either the full content (a keyframe, base_id NULL) or
+# a zlib-compressed line delta against the revision before it. depth counts
+# the deltas since the last keyframe, so rebuilding any revision replays at
+# most REVISION_KEYFRAME_EVERY of them.
+
+
+def _split_lines(text: str) -> list[str]:
+    return text.splitlines(keepends=True)
+
+
+def make_text_delta(base: str, text: str) -> list:
+    """Describe text as operations on base's lines.
+
+    A positive int copies that many lines, a negative int skips that many,
+    and a list inserts its lines.
+    """
+    old, new = _split_lines(base), _split_lines(text)
+    ops: list = []
+    matcher = difflib.SequenceMatcher(a=old, b=new, autojunk=False)
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag == "equal":
+            ops.append(i2 - i1)
+            continue
+        if i2 > i1:
+            ops.append(i1 - i2)
+        if j2 > j1:
+            ops.append(new[j1:j2])
+    return ops
+
+
+def apply_text_delta(base: str, ops: list) -> str:
+    """Rebuild text from base and the operations make_text_delta returned."""
+    old = _split_lines(base)
+    out: list[str] = []
+    pos = 0
+    for op in ops:
+        if isinstance(op, list):
+            out.extend(op)
+        elif op >= 0:
+            out.extend(old[pos:pos + op])
+            pos += op
+        else:
+            pos -= op
+    return "".join(out)
+
+
+def _pack(value) -> bytes:
+    return zlib.compress(json.dumps(value, separators=(",", ":")).encode("utf-8"))
+
+
+def _unpack(data: bytes):
+    return json.loads(zlib.decompress(data).decode("utf-8"))
+
+
+def _revision_data(base_text: Optional[str], text: str) -> bytes:
+    """Encode text as a keyframe if there is no base, otherwise as a delta."""
+    if base_text is None:
+        return _pack(text)
+    return _pack(make_text_delta(base_text, text))
+
+
+async def _revision_text(
+    conn: aiosqlite.Connection, draft_id: int, revision_id: int
+) -> Optional[str]:
+    """Rebuild a revision's content from its keyframe and following deltas."""
+    cursor = await conn.execute(
+        "SELECT depth FROM draft_revisions WHERE id = ? AND draft_id = ?",
+        (revision_id, draft_id),
+    )
+    row = await cursor.fetchone()
+    if not row:
+        return None
+    cursor = await conn.execute(
+        """SELECT base_id, data FROM draft_revisions
+           WHERE draft_id = ? AND id <= ? ORDER BY id DESC LIMIT ?""",
+        (draft_id, revision_id, row["depth"] + 1),
+    )
+    chain = list(reversed(await cursor.fetchall()))
+    text = _unpack(chain[0]["data"])
+    for link in chain[1:]:
+        text = apply_text_delta(text, _unpack(link["data"]))
+    return text
+
+
+def _content_size(text: str) -> int:
+    return len(text.encode("utf-8", "surrogatepass"))
+
+
+async def _record_revision(
+    db: aiosqlite.Connection, draft_id: int, content: str, version: int, force: bool = False
+):
+    """Store content as a new revision unless one was taken recently.
+
+    Must run inside a write transaction. Compacts the draft's history
+    whenever a revision is added.
+    """
+    now = datetime.now()
+    cursor = await db.execute(
+        """SELECT id, depth, created_at FROM draft_revisions
+           WHERE draft_id = ? ORDER BY id DESC LIMIT 1""",
+        (draft_id,),
+    )
+    last = await cursor.fetchone()
+    if last and not force:
+        age = now - datetime.fromisoformat(last["created_at"])
+        if age.total_seconds() < REVISION_INTERVAL:
+            return
+
+    base_id = depth = None
+    base_text = None
+    if last and last["depth"] + 1 < REVISION_KEYFRAME_EVERY:
+        base_text = await _revision_text(db, draft_id, last["id"])
+        if base_text == content:
+            return
+        base_id, depth = last["id"], last["depth"] + 1
+
+    await db.execute(
+        """INSERT INTO draft_revisions (draft_id, version, base_id, depth, data, size, created_at)
+           VALUES (?, ?, ?, ?, ?, ?, ?)""",
+        (draft_id, version, base_id, depth or 0, _revision_data(base_text, content),
+         _content_size(content), now.isoformat()),
+    )
+    await _compact_revisions(db, draft_id, now)
+
+
+def _revisions_to_keep(rows: list, now: datetime) -> set[int]:
+    """Pick the revisions the retention policy keeps.
+
+    Everything from the last REVISION_KEEP_ALL_HOURS is kept; older than
+    that, only the newest revision of each hour (up to
+    REVISION_KEEP_HOURLY_DAYS) and then of each day (up to
+    REVISION_KEEP_DAILY_DAYS).
+    """
+    keep_all = timedelta(hours=REVISION_KEEP_ALL_HOURS)
+    keep_hourly = timedelta(days=REVISION_KEEP_HOURLY_DAYS)
+    keep_daily = timedelta(days=REVISION_KEEP_DAILY_DAYS)
+
+    keep = set()
+    buckets = set()
+    for row in sorted(rows, key=lambda r: r["id"], reverse=True):
+        created = datetime.fromisoformat(row["created_at"])
+        age = now - created
+        if age < keep_all:
+            keep.add(row["id"])
+            continue
+        if age < keep_hourly:
+            bucket = created.strftime("%Y-%m-%d %H")
+        elif age < keep_daily:
+            bucket = created.strftime("%Y-%m-%d")
+        else:
+            continue
+        if bucket not in buckets:
+            buckets.add(bucket)
+            keep.add(row["id"])
+    return keep
+
+
+async def _compact_revisions(db: aiosqlite.Connection, draft_id: int, now: datetime):
+    """Drop revisions outside the retention policy, re-basing the survivors."""
+    cursor = await db.execute(
+        """SELECT id, base_id, depth, data, created_at FROM draft_revisions
+           WHERE draft_id = ? ORDER BY id""",
+        (draft_id,),
+    )
+    rows = await cursor.fetchall()
+    keep = _revisions_to_keep(rows, now)
+    if len(keep) == len(rows):
+        return
+
+    text = None
+    prev_id = prev_text = None
+    prev_depth = -1
+    for row in rows:
+        value = _unpack(row["data"])
+        text = value if row["base_id"] is None else apply_text_delta(text, value)
+        if row["id"] not in keep:
+            continue
+
+        depth = prev_depth + 1 if prev_id is not None else 0
+        if depth >= REVISION_KEYFRAME_EVERY:
+            depth = 0
+        base_id = prev_id if depth else None
+        if base_id != row["base_id"]:
+            await db.execute(
+                "UPDATE draft_revisions SET base_id = ?, depth = ?, data = ? WHERE id = ?",
+                (base_id, depth, _revision_data(prev_text if base_id else None, text), row["id"]),
+            )
+        elif depth != row["depth"]:
+            await db.execute(
+                "UPDATE draft_revisions SET depth = ? WHERE id = ?", (depth, row["id"])
+            )
+        prev_id, prev_text, prev_depth = row["id"], text, depth
+
+    dropped = [row["id"] for row in rows if row["id"] not in keep]
+    placeholders = ",".join("?" * len(dropped))
+    await db.execute(f"DELETE FROM draft_revisions WHERE id IN ({placeholders})", dropped)
+
+
+async def get_draft_revisions(draft_id: int) -> list[dict]:
+    """List a draft's revisions, newest first, without their content."""
+    async with _reader() as db:
+        cursor = await db.execute(
+            """SELECT id, version, size, length(data) AS stored_size, created_at
+               FROM draft_revisions WHERE draft_id = ? ORDER BY id DESC""",
+            (draft_id,),
+        )
+        rows = await cursor.fetchall()
+        return [dict(row) for row in rows]
+
+
+async def get_draft_revision(draft_id: int, revision_id: int) -> Optional[dict]:
+    """Get one revision of a draft, including its rebuilt content."""
+    async with _reader() as db:
+        cursor = await db.execute(
+            """SELECT id, version, size, created_at FROM draft_revisions
+               WHERE id = ? AND draft_id = ?""",
+            (revision_id, draft_id),
+        )
+        row = await cursor.fetchone()
+        if not row:
+            return None
+        revision = dict(row)
+        revision["content"] = await _revision_text(db, draft_id, revision_id)
+        return revision
+
+
+async def restore_draft_revision(draft_id: int, revision_id: int) -> Optional[dict]:
+    """Make a revision the draft's current content.
+
+    The content being replaced is saved as a revision first, so a restore
+    can itself be undone. Returns the new version and content, or None if
+    the draft or revision does not exist.
+    """
+    async with _writer() as db:
+        cursor = await db.execute(
+            "SELECT content, version FROM drafts WHERE id = ?", (draft_id,)
+        )
+        draft = await cursor.fetchone()
+        if not draft:
+            return None
+        content = await _revision_text(db, draft_id, revision_id)
+        if content is None:
+            return None
+
+        await _record_revision(db, draft_id, draft["content"] or "", draft["version"], force=True)
+        version = draft["version"] + 1
+        await db.execute(
+            "UPDATE drafts SET content = ?, version = ?, updated_at = ? WHERE id = ?",
+            (content, version, datetime.now().isoformat(), draft_id),
+        )
+        await _record_revision(db, draft_id, content, version, force=True)
+        await _add_content_media_refs(db, draft_id, content)
+        return {"version": version, "content": content}
+
+
+# Media files
+
+# Stored media as linked from draft content (media_store.STORE_WEB_PATH)
+MEDIA_LINK_PATTERN = re.compile(r"/img/media/([0-9a-f]+\.[a-z0-9]+)")
+
+
+async def _add_content_media_refs(db: aiosqlite.Connection, draft_id: int, content: str):
+    """Reference every stored file the draft's content links to.
+
+    A draft can use a file it never uploaded, by pasting its path or by an
+    upload that matched an existing file, and that must keep the file
+    alive. References are never dropped while the draft exists, since its
+    revisions may still link to the file.
+    """
+    names = sorted(set(MEDIA_LINK_PATTERN.findall(content)))
+    if not names:
+        return
+    placeholders = ", ".join("?" * len(names))
+    await db.execute(
+        f"""INSERT OR IGNORE INTO media_refs (hash, draft_id)
+            SELECT hash, ? FROM media_files WHERE filename IN ({placeholders})""",
+        [draft_id, *names],
+    )
+
+async def get_media_file(content_hash: str) -> Optional[dict]:
+    """Get the stored file for a content hash."""
+    async with _reader() as db:
+        cursor = await db.execute("SELECT * FROM media_files WHERE hash = ?", (content_hash,))
+        row = await cursor.fetchone()
+        return dict(row) if row else None
+
+
+async def get_media_files(filenames: list[str]) -> list[dict]:
+    """Get the stored files with the given names; unknown names are skipped."""
+    if not filenames:
+        return []
+    placeholders = ", ".join("?" * len(filenames))
+    async with _reader() as db:
+        cursor = await db.execute(
+            f"SELECT * FROM media_files WHERE filename IN ({placeholders})", filenames
+        )
+        return [dict(row) for row in await cursor.fetchall()]
+
+
+async def add_media_file(content_hash: str, filename: str, media_type: str, size: int):
+    """Index a newly stored file. Does nothing if the hash is already known."""
+    async with _writer() as db:
+        await db.execute(
+            """INSERT OR IGNORE INTO media_files (hash, filename, media_type, size)
+               VALUES (?, ?, ?, ?)""",
+            (content_hash, filename, media_type, size),
+        )
+
+
+async def add_media_ref(content_hash: str, draft_id: int):
+    """Record that a draft uses a stored file."""
+    async with _writer() as db:
+        await db.execute(
+            "INSERT OR IGNORE INTO media_refs (hash, draft_id) VALUES (?, ?)",
+            (content_hash, draft_id),
+        )
+
+
+async def mark_media_published(hashes: list[str]):
+    """Pin stored files used by a published post so they are never removed."""
+    if not hashes:
+        return
+    placeholders = ", ".join("?" * len(hashes))
+    async with _writer() as db:
+        await db.execute(
+            f"UPDATE media_files SET published = 1 WHERE hash IN ({placeholders})", hashes
+        )
+
+
+async def delete_unreferenced_media() -> list[str]:
+    """Forget unpublished files no draft refers to.
+
+    Returns the names of the files and their variants, for removal from disk.
+    """
+    async with _writer() as db:
+        cursor = await db.execute(
+            """SELECT v.filename FROM image_variants v
+               JOIN media_files f ON f.hash = v.hash
+               WHERE f.ref_count <= 0 AND NOT f.published"""
+        )
+        variants = [row["filename"] for row in await cursor.fetchall()]
+        cursor = await db.execute(
+            """DELETE FROM media_files WHERE ref_count <= 0 AND NOT published
+               RETURNING filename"""
+        )
+        files = [row["filename"] for row in await cursor.fetchall()]
+    return sorted(set(files + variants))
+
+
+async def replace_image_variants(content_hash: str, variants: list[dict]):
+    """Record the variants built from a stored image."""
+    async with _writer() as db:
+        await db.execute("DELETE FROM image_variants WHERE hash = ?", (content_hash,))
+        await db.executemany(
+            """INSERT OR REPLACE INTO image_variants
+               (hash, filename, media_type, width, height, size)
+               VALUES (?, ?, ?, ?, ?, ?)""",
+            [
+                (
+                    content_hash,
+                    variant["filename"],
+                    variant["media_type"],
+                    variant["width"],
+                    variant["height"],
+                    variant["size"],
+                )
+                for variant in variants
+            ],
+        )
+
+
+async def get_image_variants(hashes: list[str]) -> dict[str, list[dict]]:
+    """Get the variants of stored images, keyed by the source's filename, smallest first."""
+    if not hashes:
+        return {}
+    placeholders = ", ".join("?" * len(hashes))
+    async with _reader() as db:
+        cursor = await db.execute(
+            f"""SELECT f.filename AS source, v.filename, v.media_type, v.width, v.height, v.size
+                FROM image_variants v JOIN media_files f ON f.hash = v.hash
+                WHERE v.hash IN ({placeholders}) ORDER BY v.hash, v.width, v.id""",
+            hashes,
+        )
+        rows = await cursor.fetchall()
+    variants: dict[str, list[dict]] = {}
+    for row in rows:
+        variants.setdefault(row["source"], []).append(dict(row))
+    return variants
+
+
+# Linklog mirror
+
+async def replace_linklog_entries(entries: list[dict]):
+    """Replace the mirrored linklog entries, and their search index, with entries."""
+    async with _writer() as db:
+        await db.execute("DELETE FROM linklog_entries")
+        await db.executemany(
+            """INSERT OR REPLACE INTO linklog_entries
+               (id, url, normalized_url, title, summary, tags, date_added)
+               VALUES (?, ?, ?, ?, ?, ?, ?)""",
+            [
+                (
+                    entry["id"],
+                    entry["url"],
+                    normalize_url(entry["url"]),
+                    entry.get("title"),
+                    entry.get("summary"),
+                    json.dumps(entry.get("tags") or []),
+                    entry.get("dateAdded"),
+                )
+                for entry in entries
+                if entry.get("id") and entry.get("url")
+            ],
+        )
+        await db.execute(
+            "INSERT INTO linklog_entries_fts (linklog_entries_fts) VALUES ('rebuild')"
+        )
+
+
+async def get_published_link(url: str) -> Optional[dict]:
+    """Find the linklog entry for url, ignoring differences normalize_url removes."""
+    async with _reader() as db:
+        cursor = await db.execute(
+            "SELECT * FROM linklog_entries WHERE normalized_url = ? LIMIT 1",
+            (normalize_url(url),),
+        )
+        row = await cursor.fetchone()
+        return dict(row) if row else None
+
+
+async def get_linklog_entry(entry_id: str) -> Optional[dict]:
+    """Get a mirrored linklog entry by its id."""
+    async with _reader() as db:
+        cursor = await db.execute("SELECT * FROM linklog_entries WHERE id = ?", (entry_id,))
+        row = await cursor.fetchone()
+        return dict(row) if row else None
+
+
+# Full-text search
+
+def build_search_query(text: str) -> Optional[str]:
+    """Turn free text into an FTS5 query matching every word.
+
+    Words are quoted so punctuation cannot break the query syntax, and the
+    last one matches as a prefix so results appear while typing.
+    """
+    words = re.findall(r"\w+", text)
+    if not words:
+        return None
+    terms = [f'"{word}"' for word in words]
+    terms[-1] += "*"
+    return " ".join(terms)
+
+
+async def search(text: str, limit: int = SEARCH_LIMIT) -> list[dict]:
+    """Search drafts, queued links and linklog entries, best match first.
+
+    Each result has kind ("draft", "link" or "linklog"), ref (the draft or
+    link id, or the linklog entry id), title, url, status and a snippet with
+    matches wrapped in \x02 and \x03.
+    """
+    query = build_search_query(text)
+    if query is None:
+        return []
+    async with _reader() as db:
+        cursor = await db.execute(
+            """SELECT 'draft' AS kind, drafts.id AS ref, drafts.title, NULL AS url,
+                      drafts.status,
+                      snippet(drafts_fts, -1, char(2), char(3), '…', 12) AS snippet,
+                      bm25(drafts_fts, 10.0, 5.0, 1.0) AS rank
+               FROM drafts_fts JOIN drafts ON drafts.id = drafts_fts.rowid
+               WHERE drafts_fts MATCH :query
+               UNION ALL
+               SELECT 'link', link_queue.id, NULL, link_queue.url, link_queue.status,
+                      snippet(link_queue_fts, -1, char(2), char(3), '…', 12),
+                      bm25(link_queue_fts, 5.0, 2.0)
+               FROM link_queue_fts JOIN link_queue ON link_queue.id = link_queue_fts.rowid
+               WHERE link_queue_fts MATCH :query
+               UNION ALL
+               SELECT 'linklog', linklog_entries.id, linklog_entries.title,
+                      linklog_entries.url, 'published',
+                      snippet(linklog_entries_fts, 1, char(2), char(3), '…', 12),
+                      bm25(linklog_entries_fts, 10.0, 1.0, 5.0)
+               FROM linklog_entries_fts
+               JOIN linklog_entries ON linklog_entries.rowid = linklog_entries_fts.rowid
+               WHERE linklog_entries_fts MATCH :query
+               ORDER BY rank
+               LIMIT :limit""",
+            {"query": query, "limit": limit},
+        )
+        rows = await cursor.fetchall()
+        return [dict(row) for row in rows]
+
+
+# Paragraph analysis cache
+
+async def get_cached_analyses(keys: list[str]) -> dict[str, dict]:
+    """Look up cached analyses by key, marking the hits as recently used."""
+    if not keys:
+        return {}
+    placeholders = ", ".join("?" for _ in keys)
+    async with _reader() as db:
+        cursor = await db.execute(
+            f"SELECT key, result FROM analysis_cache WHERE key IN ({placeholders})",
+            keys,
+        )
+        found = {row["key"]: json.loads(row["result"]) for row in await cursor.fetchall()}
+
+    if found:
+        hit_keys = list(found)
+        async with _writer() as db:
+            await db.execute(
+                f"""UPDATE analysis_cache SET hits = hits + 1, last_used_at = ?
+                    WHERE key IN ({", ".join("?" for _ in hit_keys)})""",
+                [datetime.now().isoformat(), *hit_keys],
+            )
+    return found
+
+
+async def put_cached_analyses(results: dict[str, dict]):
+    """Store analyses keyed by their content hash."""
+    if not results:
+        return
+    now = datetime.now().isoformat()
+    async with _writer() as db:
+        await db.executemany(
+            """INSERT OR REPLACE INTO analysis_cache (key, result, created_at, last_used_at)
+               VALUES (?, ?, ?, ?)""",
+            [(key, json.dumps(result), now, now) for key, result in results.items()],
+        )
+
+
+async def evict_analysis_cache(max_entries: int, max_age_days: int) -> int:
+    """Drop entries unused for max_age_days, then the least recently used
+    beyond max_entries. Returns the number of entries removed."""
+    cutoff = (datetime.now() - timedelta(days=max_age_days)).isoformat()
+    async with _writer() as db:
+        cursor = await db.execute(
+            "DELETE FROM analysis_cache WHERE last_used_at < ?", (cutoff,)
+        )
+        removed = cursor.rowcount
+        cursor = await db.execute(
+            """DELETE FROM analysis_cache WHERE key IN (
+                   SELECT key FROM analysis_cache
+                   ORDER BY last_used_at DESC LIMIT -1 OFFSET ?
+               )""",
+            (max_entries,),
+        )
+        return removed + cursor.rowcount
+
+
+async def get_analysis_cache_info() -> dict:
+    """Get the number of cached analyses and their total stored size."""
+    async with _reader() as db:
+        cursor = await db.execute(
+            """SELECT COUNT(*) AS entries, COALESCE(SUM(LENGTH(result)), 0) AS bytes,
+                      COALESCE(SUM(hits), 0) AS hits
+               FROM analysis_cache"""
+        )
+        return dict(await cursor.fetchone())
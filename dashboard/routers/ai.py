@@ -1,42 +1,115 @@
 """API routes for AI-assisted writing analysis."""
 
 import json
+from dataclasses import asdict
 
 from fastapi import APIRouter, HTTPException
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 
 from .. import db
-from ..services.claude_client import analyze_all_paragraphs
+from ..services.claude_client import (
+    TokenUsage,
+    analyze_all_paragraphs,
+    cache_stats,
+    iter_paragraph_analyses,
+    split_paragraphs,
+)
 
 router = APIRouter()
 
 
 class AnalyzeRequest(BaseModel):
     draft_id: int
+    # Re-analyse only paragraphs that changed since the stored analysis
+    incremental: bool = False
 
 
-@router.post("/analyze")
-async def analyze_draft(request: AnalyzeRequest):
-    """Analyze all paragraphs of a draft with AI."""
-    draft = await db.get_draft(request.draft_id)
+async def _load_draft_for_analysis(draft_id: int, incremental: bool) -> tuple[dict, list[dict]]:
+    """Fetch a draft's analysis inputs and stored analysis, or raise the matching HTTP error."""
+    draft = await db.get_draft(draft_id)
     if not draft:
         raise HTTPException(status_code=404, detail="Draft not found")
 
     if not draft["content"]:
         raise HTTPException(status_code=400, detail="Draft has no content to analyze")
 
-    tags = json.loads(draft["tags"]) if draft["tags"] else []
-    audience_notes = draft["audience_notes"] or ""
+    stored = json.loads(draft["ai_analysis"]) if draft["ai_analysis"] else []
+
+    inputs = {
+        "content": draft["content"],
+        "audience_notes": draft["audience_notes"] or "",
+        "tags": json.loads(draft["tags"]) if draft["tags"] else [],
+        "previous": stored if incremental and stored else None,
+    }
+    return inputs, stored
+
+
+@router.post("/analyze")
+async def analyze_draft(request: AnalyzeRequest):
+    """Analyze all paragraphs of a draft with AI."""
+    inputs, _ = await _load_draft_for_analysis(request.draft_id, request.incremental)
+
+    usage = TokenUsage()
 
     try:
-        results = await analyze_all_paragraphs(
-            content=draft["content"],
-            audience_notes=audience_notes,
-            tags=tags,
-        )
+        results = await analyze_all_paragraphs(**inputs, usage=usage)
 
         await db.update_draft(request.draft_id, ai_analysis=results)
 
-        return {"status": "analyzed", "analysis": results}
+        return {"status": "analyzed", "analysis": results, "usage": asdict(usage)}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.get("/analyze/stream")
+async def analyze_draft_stream(draft_id: int, incremental: bool = False):
+    """Analyze a draft with SSE events for each paragraph as it completes.
+
+    Results are merged into the draft's stored analysis by paragraph as
+    they arrive, so a dropped connection keeps every paragraph analysed so
+    far and the stored results for the rest.
+    """
+    inputs, stored = await _load_draft_for_analysis(draft_id, incremental)
+    total = len(split_paragraphs(inputs["content"]))
+    # Stored results past the end of the post no longer describe anything
+    merged = {
+        item["paragraph_index"]: item
+        for item in stored
+        if item.get("paragraph_index", total) < total
+    }
+
+    async def event_generator():
+        yield f"data: {json.dumps({'type': 'start', 'draft_id': draft_id, 'total': total})}\n\n"
+
+        results: list[dict] = []
+        usage = TokenUsage()
+        try:
+            async for result in iter_paragraph_analyses(**inputs, usage=usage):
+                results.append(result)
+                results.sort(key=lambda item: item["paragraph_index"])
+                merged[result["paragraph_index"]] = result
+                await db.update_draft(
+                    draft_id, ai_analysis=[merged[index] for index in sorted(merged)]
+                )
+                yield f"data: {json.dumps({'type': 'paragraph', 'analysis': result, 'done': len(results), 'total': total})}\n\n"
+        except Exception as e:
+            yield f"data: {json.dumps({'type': 'error', 'message': str(e)})}\n\n"
+            return
+
+        yield f"data: {json.dumps({'type': 'complete', 'analysis': results, 'usage': asdict(usage)})}\n\n"
+
+    return StreamingResponse(event_generator(), media_type="text/event-stream")
+
+
+@router.get("/cache")
+async def analysis_cache_stats():
+    """Report analysis cache size and hit/miss counters."""
+    info = await db.get_analysis_cache_info()
+    return {
+        "entries": info["entries"],
+        "bytes": info["bytes"],
+        "lifetime_hits": info["hits"],
+        "hits": cache_stats.hits,
+        "misses": cache_stats.misses,
+    }
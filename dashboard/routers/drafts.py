@@ -1,36 +1,71 @@
 """API routes for draft management."""
 
 import json
-import uuid
 from pathlib import Path
+from typing import AsyncIterator, Literal, Optional
 
-from fastapi import APIRouter, Form, HTTPException, Request, Response, UploadFile, File
+from fastapi import APIRouter, Form, HTTPException, Query, Request, Response
 from fastapi.responses import HTMLResponse
 from fastapi.templating import Jinja2Templates
+from pydantic import BaseModel, Field
+from starlette.datastructures import UploadFile
 
 from .. import db
-from ..config import MEDIA_DIR
-from ..services.blog_publisher import blog_publisher
-
-ALLOWED_IMAGE_TYPES = {"image/jpeg", "image/png", "image/gif", "image/webp"}
-ALLOWED_VIDEO_TYPES = {"video/mp4", "video/webm"}
-MAX_IMAGE_SIZE = 10 * 1024 * 1024  # 10MB
-MAX_VIDEO_SIZE = 50 * 1024 * 1024  # 50MB
+from ..config import PAGE_SIZE
+from ..services.blog_publisher import PUBLISH_STAGES, blog_publisher
+from ..services.event_bus import JobChannel, event_bus
+from ..services.image_optimizer import image_optimizer
+from ..services.media_store import (
+    MAX_VIDEO_SIZE,
+    UPLOAD_CHUNK_SIZE,
+    MediaRejected,
+    MediaTooLarge,
+    media_store,
+)
+from .jobs import job_info
 
 router = APIRouter()
 templates = Jinja2Templates(directory=Path(__file__).parent.parent / "templates")
 
 
-@router.get("/")
-async def list_drafts():
-    """List all drafts."""
-    drafts = await db.get_drafts()
+async def _get_drafts_page(
+    status: Optional[str], cursor: Optional[str], limit: int, full: bool = False
+) -> tuple[list[dict], Optional[str]]:
+    try:
+        drafts, next_cursor = await db.get_drafts_page(status, cursor, limit, full=full)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     for draft in drafts:
         if draft.get("tags"):
             draft["tags"] = json.loads(draft["tags"])
         if draft.get("ai_analysis"):
             draft["ai_analysis"] = json.loads(draft["ai_analysis"])
-    return drafts
+    return drafts, next_cursor
+
+
+@router.get("/")
+async def list_drafts(
+    cursor: Optional[str] = None,
+    status: Optional[str] = None,
+    limit: int = Query(PAGE_SIZE, ge=1, le=500),
+    fields: Literal["summary", "full"] = "summary",
+):
+    """List drafts, most recently updated first, one page at a time."""
+    drafts, next_cursor = await _get_drafts_page(
+        status, cursor, limit, full=(fields == "full")
+    )
+    return {"items": drafts, "next_cursor": next_cursor}
+
+
+@router.get("/cards", response_class=HTMLResponse)
+async def draft_cards(request: Request, cursor: Optional[str] = None):
+    """Render the next page of draft cards for infinite scroll."""
+    drafts, next_cursor = await _get_drafts_page(None, cursor, PAGE_SIZE)
+    return templates.TemplateResponse(
+        request,
+        "_draft_cards.html",
+        {"request": request, "drafts": drafts, "next_cursor": next_cursor},
+    )
 
 
 @router.post("/", response_class=HTMLResponse)
@@ -88,77 +123,221 @@ async def update_draft(
     return {"status": "updated", "draft": updated_draft}
 
 
-@router.delete("/{draft_id}")
-async def delete_draft(draft_id: int):
-    """Delete a draft."""
-    await db.delete_draft(draft_id)
-    return Response(status_code=200)
+class TextEdit(BaseModel):
+    # Offsets are UTF-16 code units into the content at the base version
+    start: int = Field(ge=0)
+    end: int = Field(ge=0)
+    text: str = ""
 
 
-@router.post("/{draft_id}/publish")
-async def publish_draft(draft_id: int):
-    """Publish a draft to the blog."""
+class DraftPatch(BaseModel):
+    version: int
+    edits: list[TextEdit] = []
+    # UTF-16 length of the content after the edits, to catch divergence
+    length: Optional[int] = None
+    title: Optional[str] = None
+    description: Optional[str] = None
+    tags: Optional[str] = None
+    audience_notes: Optional[str] = None
+
+
+@router.patch("/{draft_id}")
+async def patch_draft(draft_id: int, patch: DraftPatch):
+    """Apply an autosave delta to a draft and return the new version.
+
+    Responds 409 with the current version if the edits were made against
+    an older version, so the editor can stop and ask the user which copy to
+    keep. Responds 422 if the edits do not fit the stored content, in which
+    case the editor falls back to a full save.
+    """
+    tags = None
+    if patch.tags is not None:
+        tags = json.dumps([t.strip() for t in patch.tags.split(",") if t.strip()])
+
+    try:
+        version = await db.patch_draft(
+            draft_id,
+            patch.version,
+            [edit.model_dump() for edit in patch.edits],
+            expected_length=patch.length,
+            title=patch.title,
+            description=patch.description,
+            tags=tags,
+            audience_notes=patch.audience_notes,
+        )
+    except db.DraftVersionConflict as e:
+        raise HTTPException(
+            status_code=409,
+            detail={"message": "Draft has changed", "version": e.current_version},
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail={"message": str(e)})
+
+    if version is None:
+        raise HTTPException(status_code=404, detail="Draft not found")
+    return {"version": version}
+
+
+@router.get("/{draft_id}/revisions")
+async def list_revisions(draft_id: int):
+    """List a draft's saved revisions, newest first."""
     draft = await db.get_draft(draft_id)
     if not draft:
         raise HTTPException(status_code=404, detail="Draft not found")
+    return {"revisions": await db.get_draft_revisions(draft_id)}
 
-    if not draft["title"]:
-        raise HTTPException(status_code=400, detail="Draft must have a title")
-    if not draft["content"]:
-        raise HTTPException(status_code=400, detail="Draft must have content")
 
-    tags = json.loads(draft["tags"]) if draft["tags"] else []
-    description = draft["description"] or ""
+@router.get("/{draft_id}/revisions/{revision_id}")
+async def get_revision(draft_id: int, revision_id: int):
+    """Get the content of one revision."""
+    revision = await db.get_draft_revision(draft_id, revision_id)
+    if not revision:
+        raise HTTPException(status_code=404, detail="Revision not found")
+    return revision
+
+
+@router.post("/{draft_id}/revisions/{revision_id}/restore")
+async def restore_revision(draft_id: int, revision_id: int):
+    """Replace the draft's content with a revision's.
+
+    The replaced content is kept as a revision of its own.
+    """
+    restored = await db.restore_draft_revision(draft_id, revision_id)
+    if not restored:
+        raise HTTPException(status_code=404, detail="Revision not found")
+    return {"status": "restored", **restored}
+
+
+@router.delete("/{draft_id}")
+async def delete_draft(draft_id: int):
+    """Delete a draft, and any media only it was using."""
+    await db.delete_draft(draft_id)
+    await media_store.remove_unreferenced()
+    return Response(status_code=200)
+
+
+async def _publish_job(channel: JobChannel, draft: dict):
+    """Publish a draft, reporting each stage on channel and in the draft's row."""
+    draft_id = draft["id"]
+    channel.publish({"type": "start", "draft_id": draft_id, "title": draft["title"]})
+    reached = None
+
+    async def record(stage: str):
+        nonlocal reached
+        reached = stage
+        status = "queued" if stage in ("preparing_media", "waiting_for_repo") else "publishing"
+        await db.update_draft_publish(draft_id, status, stage)
+        channel.publish({"type": "progress", "stage": stage, "message": PUBLISH_STAGES[stage]})
 
     try:
         published_path = await blog_publisher.publish(
             title=draft["title"],
-            description=description,
-            tags=tags,
+            description=draft["description"] or "",
+            tags=json.loads(draft["tags"]) if draft["tags"] else [],
             content=draft["content"],
             draft_id=draft_id,
+            on_stage=record,
         )
         await db.mark_draft_published(draft_id, published_path)
-        return {"status": "published", "path": published_path}
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        await db.update_draft_publish(draft_id, "failed", reached, str(e))
+        channel.publish(
+            {"type": "complete", "success": False, "draft_id": draft_id, "error": str(e)}
+        )
+        return
 
+    channel.publish(
+        {"type": "complete", "success": True, "draft_id": draft_id, "path": published_path}
+    )
 
-@router.post("/{draft_id}/media")
-async def upload_media(draft_id: int, file: UploadFile = File(...)):
-    """Upload a media file for a draft."""
+
+@router.post("/{draft_id}/publish", status_code=202)
+async def publish_draft(draft_id: int):
+    """Queue a draft to be published to the blog.
+
+    Publishing runs as a background job, one repository write at a time;
+    progress is read from ``/api/jobs/{job_id}/events``.
+    """
+    draft = await db.get_draft(draft_id)
+    if not draft:
+        raise HTTPException(status_code=404, detail="Draft not found")
+
+    if not draft["title"]:
+        raise HTTPException(status_code=400, detail="Draft must have a title")
+    if not draft["content"]:
+        raise HTTPException(status_code=400, detail="Draft must have content")
+
+    if not await db.queue_draft_publish(draft_id):
+        raise HTTPException(status_code=409, detail="Draft is already being published")
+    channel = event_bus.start("publish", lambda channel: _publish_job(channel, draft))
+    await db.set_draft_publish_job(draft_id, channel.job_id)
+    return {"status": "queued", **job_info(channel)}
+
+
+@router.get("/{draft_id}/publish")
+async def publish_status(draft_id: int):
+    """The state of a draft's latest publish, and its job if still running."""
     draft = await db.get_draft(draft_id)
     if not draft:
         raise HTTPException(status_code=404, detail="Draft not found")
 
-    content_type = file.content_type or ""
-    is_image = content_type in ALLOWED_IMAGE_TYPES
-    is_video = content_type in ALLOWED_VIDEO_TYPES
+    channel = event_bus.get(draft["publish_job_id"]) if draft["publish_job_id"] else None
+    return {
+        "status": draft["publish_status"],
+        "stage": draft["publish_stage"],
+        "error": draft["publish_error"],
+        "path": draft["published_path"],
+        "job_id": draft["publish_job_id"],
+        "running": bool(channel and not channel.closed),
+    }
 
-    if not is_image and not is_video:
-        raise HTTPException(
-            status_code=400,
-            detail=f"Invalid file type: {content_type}. Allowed: images (jpg, png, gif, webp) and videos (mp4, webm)"
-        )
 
-    content = await file.read()
-    file_size = len(content)
+async def _iter_upload_file(file: UploadFile) -> AsyncIterator[bytes]:
+    while chunk := await file.read(UPLOAD_CHUNK_SIZE):
+        yield chunk
 
-    if is_image and file_size > MAX_IMAGE_SIZE:
-        raise HTTPException(status_code=400, detail="Image too large. Maximum size is 10MB.")
-    if is_video and file_size > MAX_VIDEO_SIZE:
-        raise HTTPException(status_code=400, detail="Video too large. Maximum size is 50MB.")
 
-    draft_media_dir = MEDIA_DIR / "drafts" / str(draft_id)
-    draft_media_dir.mkdir(parents=True, exist_ok=True)
+@router.post("/{draft_id}/media")
+async def upload_media(draft_id: int, request: Request):
+    """Upload a media file for a draft.
 
-    original_name = Path(file.filename) if file.filename else Path("file")
-    extension = original_name.suffix.lower() or (".jpg" if is_image else ".mp4")
-    unique_name = f"{uuid.uuid4().hex[:8]}{extension}"
-    file_path = draft_media_dir / unique_name
+    The file is sent as the raw request body, which is streamed to disk
+    so the size limit applies as it arrives. A multipart form with a
+    ``file`` field also works, but Starlette spools it in full first.
 
-    with open(file_path, "wb") as f:
-        f.write(content)
+    Content that is already stored is not stored again; the existing
+    file's path is returned.
+    """
+    draft = await db.get_draft(draft_id)
+    if not draft:
+        raise HTTPException(status_code=404, detail="Draft not found")
+
+    if request.headers.get("content-type", "").startswith("multipart/form-data"):
+        form = await request.form()
+        file = form.get("file")
+        if not isinstance(file, UploadFile):
+            raise HTTPException(status_code=400, detail="No file uploaded")
+        chunks = _iter_upload_file(file)
+    else:
+        declared = request.headers.get("content-length")
+        if declared and declared.isdigit() and int(declared) > MAX_VIDEO_SIZE:
+            raise HTTPException(status_code=413, detail="File too large. Maximum size is 50MB.")
+        chunks = request.stream()
 
-    web_path = f"/img/drafts/{draft_id}/{unique_name}"
-    return {"status": "uploaded", "path": web_path, "filename": unique_name}
+    try:
+        stored = await media_store.save_upload(draft_id, chunks)
+    except MediaTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except MediaRejected as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    if stored.created:
+        image_optimizer.schedule(
+            stored.content_hash, media_store.path(stored.filename), stored.media_type
+        )
+    return {
+        "status": "uploaded",
+        "path": stored.web_path,
+        "filename": stored.filename,
+        "deduplicated": not stored.created,
+    }
@@ -0,0 +1,57 @@
+"""API routes for following background jobs."""
+
+from typing import Optional
+
+from fastapi import APIRouter, Header, HTTPException, Query, Response
+from fastapi.responses import StreamingResponse
+
+from ..services.event_bus import JobChannel, event_bus, format_sse
+
+router = APIRouter()
+
+
+def job_info(channel: JobChannel) -> dict:
+    return {
+        "job_id": channel.job_id,
+        "kind": channel.kind,
+        "running": not channel.closed,
+        "last_event_id": channel.last_event_id,
+    }
+
+
+@router.get("/{job_id}")
+async def get_job(job_id: str):
+    """Whether a job is still running, and how many events it has sent."""
+    channel = event_bus.get(job_id)
+    if not channel:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job_info(channel)
+
+
+@router.get("/{job_id}/events")
+async def job_events(
+    job_id: str,
+    last_event_id: Optional[int] = Query(None),
+    last_event_id_header: Optional[str] = Header(None, alias="Last-Event-ID"),
+):
+    """Stream a job's progress over SSE, replaying buffered events first.
+
+    Reconnecting browsers send ``Last-Event-ID`` and only get what they
+    missed. A finished job with nothing new answers 204, which tells
+    EventSource to stop reconnecting.
+    """
+    channel = event_bus.get(job_id)
+    if not channel:
+        raise HTTPException(status_code=404, detail="Job not found")
+
+    after = last_event_id or 0
+    if last_event_id_header and last_event_id_header.isdigit():
+        after = int(last_event_id_header)
+    if channel.closed and not channel.events_after(after):
+        return Response(status_code=204)
+
+    async def event_generator():
+        async for event in channel.subscribe(after):
+            yield format_sse(event)
+
+    return StreamingResponse(event_generator(), media_type="text/event-stream")
@@ -1,28 +1,57 @@
 """API routes for link queue management."""
 
-import asyncio
 import json
 from pathlib import Path
+from typing import Optional
 
-from fastapi import APIRouter, Form, HTTPException, Request, Response
-from fastapi.responses import HTMLResponse, StreamingResponse
+from fastapi import APIRouter, File, Form, HTTPException, Query, Request, Response, UploadFile
+from fastapi.responses import HTMLResponse
 from fastapi.templating import Jinja2Templates
 
 from .. import db
-from ..services.llog_runner import llog_runner
+from ..config import PAGE_SIZE
+from ..services.event_bus import event_bus
+from ..services.link_import import parse_links
+from ..services.link_worker import link_worker_pool
+from ..services.linklog_index import linklog_index
+from .jobs import job_info
 
 router = APIRouter()
 templates = Jinja2Templates(directory=Path(__file__).parent.parent / "templates")
 
 
-@router.get("/")
-async def list_links():
-    """List all queued links."""
-    links = await db.get_links()
+async def _get_links_page(
+    status: Optional[str], cursor: Optional[str], limit: int
+) -> tuple[list[dict], Optional[str]]:
+    try:
+        links, next_cursor = await db.get_links_page(status, cursor, limit)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     for link in links:
-        if link.get("tags"):
-            link["tags"] = json.loads(link["tags"])
-    return links
+        link["tags"] = json.loads(link["tags"]) if link.get("tags") else []
+    return links, next_cursor
+
+
+@router.get("/")
+async def list_links(
+    cursor: Optional[str] = None,
+    status: Optional[str] = None,
+    limit: int = Query(PAGE_SIZE, ge=1, le=500),
+):
+    """List queued links, newest first, one page at a time."""
+    links, next_cursor = await _get_links_page(status, cursor, limit)
+    return {"items": links, "next_cursor": next_cursor}
+
+
+@router.get("/rows", response_class=HTMLResponse)
+async def link_rows(request: Request, cursor: Optional[str] = None):
+    """Render the next page of link rows for infinite scroll."""
+    links, next_cursor = await _get_links_page(None, cursor, PAGE_SIZE)
+    return templates.TemplateResponse(
+        request,
+        "_link_rows.html",
+        {"request": request, "links": links, "next_cursor": next_cursor},
+    )
 
 
 @router.post("/", response_class=HTMLResponse)
@@ -30,8 +59,17 @@ async def add_link(request: Request, url: str = Form(...), tags: str = Form(""))
     """Add a new link to the queue."""
     tag_list = [t.strip().lstrip("#") for t in tags.split() if t.strip()]
 
+    await linklog_index.sync()
+    published = await db.get_published_link(url)
+    if published:
+        raise HTTPException(
+            status_code=400,
+            detail=f"URL already in linklog with ID: {published['id']}",
+        )
+
     try:
         link_id = await db.add_link(url, tag_list)
+        link_worker_pool.notify()
         link = await db.get_link(link_id)
         link["tags"] = json.loads(link["tags"]) if link.get("tags") else []
         return templates.TemplateResponse(
@@ -39,10 +77,45 @@ async def add_link(request: Request, url: str = Form(...), tags: str = Form(""))
         )
     except Exception as e:
         if "UNIQUE constraint failed" in str(e):
-            raise HTTPException(status_code=400, detail="URL already in queue")
+            raise HTTPException(
+                status_code=400, detail="URL (or an equivalent one) already in queue"
+            )
         raise
 
 
+@router.post("/import")
+async def import_links(
+    file: Optional[UploadFile] = File(None),
+    text: Optional[str] = Form(None),
+    tags: str = Form(""),
+):
+    """Queue every link in an uploaded reading list.
+
+    Takes a file upload or a text field holding newline-separated URLs,
+    OPML or a bookmarks export. tags are added to every imported link.
+    """
+    if file is not None:
+        text = (await file.read()).decode("utf-8", errors="replace")
+    if not text:
+        raise HTTPException(status_code=400, detail="Nothing to import")
+
+    tag_list = [t.strip().lstrip("#") for t in tags.split() if t.strip()]
+    try:
+        links, invalid = parse_links(text, tag_list)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Could not parse import: {e}")
+
+    await linklog_index.sync()
+    inserted = await db.add_links(links)
+    if inserted:
+        link_worker_pool.notify()
+    return {
+        "inserted": inserted,
+        "duplicates": len(links) - inserted,
+        "invalid": invalid,
+    }
+
+
 @router.delete("/{link_id}")
 async def delete_link(link_id: int):
     """Remove a link from the queue."""
@@ -58,124 +131,54 @@ async def retry_link(link_id: int):
         raise HTTPException(status_code=404, detail="Link not found")
 
     await db.update_link_status(link_id, "pending")
+    link_worker_pool.notify()
     return {"status": "queued for retry"}
 
 
-@router.get("/process/stream")
-async def process_next_link_stream():
-    """Process the next pending link with SSE progress streaming."""
-    link = await db.get_next_pending_link()
-    if not link:
-        async def no_links():
-            yield f"data: {json.dumps({'type': 'error', 'message': 'No pending links'})}\n\n"
-        return StreamingResponse(no_links(), media_type="text/event-stream")
-
-    await db.update_link_status(link["id"], "processing")
-    tags = json.loads(link["tags"]) if link["tags"] else []
-
-    async def event_generator():
-        yield f"data: {json.dumps({'type': 'start', 'link_id': link['id'], 'url': link['url']})}\n\n"
-
-        stdout_lines = []
-        stderr_lines = []
-        return_code = 0
-
-        try:
-            from ..config import PROJECT_ROOT, LLOG_SCRIPT
+@router.post("/jobs")
+async def start_link_job():
+    """Start processing the next pending link in the background.
 
-            tag_args = [f"#{tag}" for tag in tags if tag]
-            cmd = ["node", str(LLOG_SCRIPT), link["url"]] + tag_args
+    Progress is read from ``/api/jobs/{job_id}/events``.
+    """
+    link = await db.claim_next_pending_link()
+    if not link:
+        raise HTTPException(status_code=404, detail="No pending links")
+    channel = event_bus.start("link", lambda channel: link_worker_pool.process(link, channel))
+    return job_info(channel)
 
-            proc = await asyncio.create_subprocess_exec(
-                *cmd,
-                cwd=str(PROJECT_ROOT),
-                stdout=asyncio.subprocess.PIPE,
-                stderr=asyncio.subprocess.PIPE,
-            )
 
-            async def read_stdout():
-                while True:
-                    line = await proc.stdout.readline()
-                    if not line:
-                        break
-                    decoded = line.decode().rstrip()
-                    stdout_lines.append(decoded)
-                    yield decoded
-
-            async def read_stderr():
-                while True:
-                    line = await proc.stderr.readline()
-                    if not line:
-                        break
-                    decoded = line.decode().rstrip()
-                    stderr_lines.append(decoded)
-
-            stderr_task = asyncio.create_task(read_stderr())
-
-            async for line in read_stdout():
-                event_data = {"type": "progress", "message": line}
-                yield f"data: {json.dumps(event_data)}\n\n"
-
-            await stderr_task
-            await proc.wait()
-            return_code = proc.returncode or 0
-
-        except Exception as e:
-            yield f"data: {json.dumps({'type': 'error', 'message': str(e)})}\n\n"
-            await db.update_link_status(link["id"], "failed", error_message=str(e))
-            return
-
-        if return_code == 0:
-            await db.update_link_status(link["id"], "completed")
-            yield f"data: {json.dumps({'type': 'complete', 'success': True, 'link_id': link['id']})}\n\n"
-        else:
-            error_msg = f"Exit code: {return_code}"
-            stderr_output = "\n".join(stderr_lines)
-            await db.update_link_status(
-                link["id"],
-                "failed",
-                error_message=error_msg,
-                error_output=f"STDOUT:\n{chr(10).join(stdout_lines)}\n\nSTDERR:\n{stderr_output}",
-            )
-            yield f"data: {json.dumps({'type': 'complete', 'success': False, 'link_id': link['id'], 'error': error_msg})}\n\n"
+@router.get("/jobs/current")
+async def current_link_job():
+    """The oldest link being processed, if any, so other tabs can attach.
 
-    return StreamingResponse(event_generator(), media_type="text/event-stream")
+    Covers links the background workers are processing as well as ones
+    started from the dashboard.
+    """
+    running = event_bus.running("link")
+    if not running:
+        return {"job_id": None, "running": False}
+    return job_info(running[0])
 
 
 @router.post("/process")
 async def process_next_link():
-    """Process the next pending link using llog.js (non-streaming fallback)."""
-    link = await db.get_next_pending_link()
+    """Process the next pending link from its last checkpoint (non-streaming fallback)."""
+    link = await db.claim_next_pending_link()
     if not link:
         return {"status": "no pending links"}
 
-    await db.update_link_status(link["id"], "processing")
-
-    tags = json.loads(link["tags"]) if link["tags"] else []
-    result = await llog_runner.process_link(link["url"], tags)
-
-    if result.success:
-        await db.update_link_status(link["id"], "completed")
-        return {
-            "status": "success",
-            "link_id": link["id"],
-            "output": result.stdout,
-        }
-    else:
-        error_msg = f"Exit code: {result.return_code}"
-        await db.update_link_status(
-            link["id"],
-            "failed",
-            error_message=error_msg,
-            error_output=f"STDOUT:\n{result.stdout}\n\nSTDERR:\n{result.stderr}",
-        )
-        return {
-            "status": "failed",
-            "link_id": link["id"],
-            "error": error_msg,
-            "output": result.stdout,
-            "stderr": result.stderr,
-        }
+    await link_worker_pool.process(link)
+
+    link = await db.get_link(link["id"])
+    if link["status"] == "completed":
+        return {"status": "success", "link_id": link["id"]}
+    return {
+        "status": "failed",
+        "link_id": link["id"],
+        "error": link["error_message"],
+        "output": link["error_output"],
+    }
 
 
 @router.get("/{link_id}/error")
@@ -0,0 +1,46 @@
+"""API routes for full-text search."""
+
+from pathlib import Path
+
+from fastapi import APIRouter, Query, Request
+from fastapi.responses import HTMLResponse
+from fastapi.templating import Jinja2Templates
+from markupsafe import Markup, escape
+
+from .. import db
+from ..config import SEARCH_LIMIT
+from ..services.linklog_index import linklog_index
+
+router = APIRouter()
+templates = Jinja2Templates(directory=Path(__file__).parent.parent / "templates")
+
+
+async def _search(q: str, limit: int) -> list[dict]:
+    await linklog_index.sync()
+    return await db.search(q, limit)
+
+
+def _highlight(snippet: str | None) -> Markup:
+    """Escape a search snippet and mark up its matches."""
+    html = str(escape(snippet or ""))
+    return Markup(html.replace("\x02", "<mark>").replace("\x03", "</mark>"))
+
+
+@router.get("/")
+async def search(q: str = "", limit: int = Query(SEARCH_LIMIT, ge=1, le=100)):
+    """Search drafts, queued links and the linklog, best match first."""
+    results = await _search(q, limit)
+    for result in results:
+        result["snippet"] = (result["snippet"] or "").replace("\x02", "").replace("\x03", "")
+    return {"results": results}
+
+
+@router.get("/results", response_class=HTMLResponse)
+async def search_results(request: Request, q: str = ""):
+    """Render search results for the search box."""
+    results = await _search(q, SEARCH_LIMIT)
+    for result in results:
+        result["snippet"] = _highlight(result["snippet"])
+    return templates.TemplateResponse(
+        request, "_search_results.html", {"results": results, "query": q}
+    )
@@ -0,0 +1,33 @@
+"""API routes for building the site."""
+
+from fastapi import APIRouter, HTTPException
+from pydantic import BaseModel
+
+from ..config import PROJECT_ROOT
+from ..services.site_builder import SiteBuildError, site_builder
+
+router = APIRouter()
+
+
+class BuildRequest(BaseModel):
+    # Paths relative to the project root, or absolute paths inside it
+    changed: list[str] = []
+
+
+@router.post("/build")
+async def build_site(build: BuildRequest):
+    """Rebuild the site after the given files changed.
+
+    Used by llog.js when the dashboard runs it, so link publishing shares
+    the warm incremental builder instead of starting a full build.
+    """
+    root = PROJECT_ROOT.resolve()
+    changed = [(root / path).resolve() for path in build.changed]
+    if any(not path.is_relative_to(root) for path in changed):
+        raise HTTPException(status_code=400, detail="Changed files must be inside the project")
+
+    try:
+        await site_builder.rebuild(changed)
+    except SiteBuildError as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    return {"status": "built"}
@@ -1,6 +1,7 @@
 """Service for publishing blog posts."""
 
 import asyncio
+import html
 import re
 import shutil
 from datetime import date
@@ -8,7 +9,52 @@ from pathlib import Path
 
 from slugify import slugify
 
-from ..config import PROJECT_ROOT, BLOG_DIR, MEDIA_DIR
+from .. import db
+from ..config import PROJECT_ROOT, BLOG_DIR, MEDIA_DIR, IMAGE_SIZES
+from .image_optimizer import MODERN_FORMATS, image_optimizer
+from .llog_runner import StageCallback, llog_runner
+from .media_store import STORE_WEB_PATH
+from .site_builder import site_builder
+
+# Stages a publish goes through, with a description for progress displays
+PUBLISH_STAGES = {
+    "preparing_media": "Preparing images...",
+    "waiting_for_repo": "Waiting for other repository changes...",
+    "writing_post": "Writing post...",
+    "building_site": "Building site...",
+    "committing": "Committing...",
+    "pushing": "Pushing...",
+}
+
+
+def _srcset(web_dir: str, variants: list[dict]) -> str:
+    return ", ".join(f"{web_dir}/{v['filename']} {v['width']}w" for v in variants)
+
+
+def picture_html(alt: str, web_dir: str, source: dict, variants: list[dict]) -> str:
+    """Render an image as a <picture> offering its variants by format and width.
+
+    Kept on one line so Markdown treats it as inline HTML.
+    """
+    by_type: dict[str, list[dict]] = {}
+    for variant in sorted(variants, key=lambda v: v["width"]):
+        by_type.setdefault(variant["media_type"], []).append(variant)
+
+    parts = ["<picture>"]
+    for media_type in MODERN_FORMATS:
+        if media_type != source["media_type"] and media_type in by_type:
+            parts.append(
+                f'<source type="{media_type}" srcset="{_srcset(web_dir, by_type[media_type])}" '
+                f'sizes="{IMAGE_SIZES}">'
+            )
+    fallback = by_type.get(source["media_type"], [source])
+    parts.append(
+        f'<img src="{web_dir}/{source["filename"]}" srcset="{_srcset(web_dir, fallback)}" '
+        f'sizes="{IMAGE_SIZES}" alt="{html.escape(alt)}" '
+        f'width="{source["width"]}" height="{source["height"]}" loading="lazy" decoding="async">'
+    )
+    parts.append("</picture>")
+    return "".join(parts)
 
 
 class BlogPublisher:
@@ -53,7 +99,11 @@ permalink: "blog/{{{{ title | slugify }}}}.html"
         return stdout.decode(), stderr.decode()
 
     def _process_draft_media(self, content: str, draft_id: int) -> str:
-        """Move draft media to dated folder and update paths in content."""
+        """Move draft media to dated folder and update paths in content.
+
+        Only media uploaded before the content-addressed store lives in a
+        draft's own folder.
+        """
         today = date.today()
         year = str(today.year)
         month = f"{today.month:02d}"
@@ -94,29 +144,84 @@ permalink: "blog/{{{{ title | slugify }}}}.html"
 
         return content
 
+    async def _use_image_variants(self, content: str) -> str:
+        """Offer the variants of stored images the post shows, and pin its stored media.
+
+        Markdown images of stored files with variants become <picture>
+        elements with a srcset, whose fallback is the full-size copy without
+        metadata. Every stored file the post refers to is marked published,
+        so deleting drafts never removes it.
+        """
+        names = set(re.findall(rf'{STORE_WEB_PATH}/([^"\'\s\)]+)', content))
+        media = await db.get_media_files(sorted(names))
+        media_types = {m["filename"]: m["media_type"] for m in media}
+        hashes = [m["hash"] for m in media]
+        await image_optimizer.wait_for(hashes)
+        variants = await db.get_image_variants(hashes)
+
+        for filename, rows in variants.items():
+            # Rows come smallest first, so the last match is full size
+            source = next(
+                (v for v in reversed(rows) if v["media_type"] == media_types[filename]), None
+            )
+            if source is None:
+                continue
+            web_path = f"{STORE_WEB_PATH}/{filename}"
+            content = re.sub(
+                rf'!\[([^\]]*)\]\({re.escape(web_path)}(?:\s+"[^"]*")?\)',
+                lambda m: picture_html(m[1], STORE_WEB_PATH, source, rows),
+                content,
+            )
+
+        await db.mark_media_published(hashes)
+        return content
+
     async def publish(
-        self, title: str, description: str, tags: list[str], content: str, draft_id: int | None = None
+        self,
+        title: str,
+        description: str,
+        tags: list[str],
+        content: str,
+        draft_id: int | None = None,
+        on_stage: StageCallback | None = None,
     ) -> str:
         """Publish a blog post: create file, build, commit, push.
 
+        Everything that touches the working tree runs under the repository
+        lock, so it never interleaves with llog.js adding links. ``on_stage``
+        is awaited with each PUBLISH_STAGES stage as it starts.
+
         Returns the path to the published file.
         """
-        filename = self.generate_filename(title)
-        filepath = BLOG_DIR / filename
+        async def stage(name: str):
+            if on_stage:
+                await on_stage(name)
 
-        if draft_id is not None:
-            content = self._process_draft_media(content, draft_id)
+        await stage("preparing_media")
+        content = await self._use_image_variants(content)
 
-        full_content = self.generate_frontmatter(title, description, tags) + content
-        filepath.write_text(full_content)
+        await stage("waiting_for_repo")
+        async with llog_runner.repo_lock:
+            await stage("writing_post")
+            filename = self.generate_filename(title)
+            filepath = BLOG_DIR / filename
 
-        await self._run_command(["npm", "run", "go!"])
+            if draft_id is not None:
+                content = self._process_draft_media(content, draft_id)
 
-        await self._run_command(["git", "add", "."])
-        await self._run_command(
-            ["git", "commit", "-m", f"Publish blog post: {title}"]
-        )
-        await self._run_command(["git", "push", "origin", "main"])
+            full_content = self.generate_frontmatter(title, description, tags) + content
+            filepath.write_text(full_content)
+
+            await stage("building_site")
+            await site_builder.rebuild([filepath])
+
+            await stage("committing")
+            await self._run_command(["git", "add", "."])
+            await self._run_command(
+                ["git", "commit", "-m", f"Publish blog post: {title}"]
+            )
+            await stage("pushing")
+            await self._run_command(["git", "push", "origin", "main"])
 
         return str(filepath)
 
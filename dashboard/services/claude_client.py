@@ -1,38 +1,145 @@
 """Claude API client for AI-assisted writing analysis."""
 
+import asyncio
+import difflib
+import hashlib
+import importlib.util
 import json
-from typing import Optional
+import random
+from dataclasses import dataclass
+from typing import AsyncIterator, Optional
 
 import httpx
 
-from ..config import get_api_key
+from .. import db
+from ..config import (
+    AI_CACHE_MAX_AGE_DAYS,
+    AI_CACHE_MAX_ENTRIES,
+    AI_CONTEXT_WINDOW,
+    AI_HTTP_CONNECT_TIMEOUT,
+    AI_HTTP_KEEPALIVE_EXPIRY,
+    AI_HTTP_MAX_CONNECTIONS,
+    AI_HTTP_READ_TIMEOUT,
+    AI_MAX_CONCURRENCY,
+    AI_MAX_RETRIES,
+    AI_RETRY_BASE_DELAY,
+    AI_RETRY_MAX_DELAY,
+    CLAUDE_API_URL,
+    get_api_key,
+)
 
-API_URL = "https://api.anthropic.com/v1/messages"
+API_URL = CLAUDE_API_URL
 MODEL = "claude-sonnet-4-5"
+# Bump whenever build_analysis_prompt changes so stale cached analyses are ignored
+PROMPT_VERSION = 2
 
+# Rate limited (429) and overloaded (529) responses are worth retrying
+RETRY_STATUS_CODES = {429, 529}
 
-def build_analysis_prompt(
+
+_client: httpx.AsyncClient | None = None
+_api_key: str | None = None
+
+
+async def open_client():
+    """Create the process-wide HTTP client used for every API call.
+
+    Connections are pooled and kept alive between paragraphs; HTTP/2 is
+    used when the optional h2 package is installed.
+    """
+    global _client
+    if _client is not None:
+        return
+    _client = httpx.AsyncClient(
+        http2=importlib.util.find_spec("h2") is not None,
+        limits=httpx.Limits(
+            max_connections=AI_HTTP_MAX_CONNECTIONS,
+            max_keepalive_connections=AI_HTTP_MAX_CONNECTIONS,
+            keepalive_expiry=AI_HTTP_KEEPALIVE_EXPIRY,
+        ),
+        timeout=httpx.Timeout(AI_HTTP_READ_TIMEOUT, connect=AI_HTTP_CONNECT_TIMEOUT),
+    )
+
+
+async def close_client():
+    """Close the shared HTTP client."""
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+
+
+def _get_client() -> httpx.AsyncClient:
+    if _client is None:
+        raise RuntimeError("Claude client is not open; call open_client() first")
+    return _client
+
+
+def _get_api_key() -> str:
+    """Resolve the API key on first use and remember it.
+
+    A missing key is not remembered, so fixing ~/llog.conf takes effect
+    on the next request without a restart.
+    """
+    global _api_key
+    if _api_key is None:
+        _api_key = get_api_key()
+    return _api_key
+
+
+@dataclass
+class CacheStats:
+    hits: int = 0
+    misses: int = 0
+
+
+@dataclass
+class TokenUsage:
+    """Token counts accumulated over one analysis run."""
+
+    requests: int = 0
+    input_tokens: int = 0
+    output_tokens: int = 0
+    cache_creation_input_tokens: int = 0
+    cache_read_input_tokens: int = 0
+
+    def add(self, usage: dict):
+        self.requests += 1
+        self.input_tokens += usage.get("input_tokens") or 0
+        self.output_tokens += usage.get("output_tokens") or 0
+        self.cache_creation_input_tokens += usage.get("cache_creation_input_tokens") or 0
+        self.cache_read_input_tokens += usage.get("cache_read_input_tokens") or 0
+
+
+cache_stats = CacheStats()
+
+
+def analysis_cache_key(
     paragraph: str,
     context: str,
     audience_notes: str,
     tags: list[str],
     is_last: bool,
 ) -> str:
-    """Build the prompt for paragraph analysis."""
-    full_context = context if not is_last else f"{context}\n\n{paragraph}"
+    """Hash everything that determines a paragraph's analysis.
 
-    return f"""You are a writing assistant helping analyze a blog post paragraph.
+    The prompt's shared prefix holds the whole post, but paragraphs after
+    this one are left out of the key on purpose. The prompt tells the model
+    to judge a paragraph only against those before it, and the last
+    paragraph's context already covers the whole post. Keying on the full
+    post would make every edit miss the cache for every paragraph. The
+    price is an occasional result that a later paragraph would have nudged
+    slightly.
+    """
+    material = json.dumps(
+        [paragraph, context, audience_notes, tags, is_last, MODEL, PROMPT_VERSION]
+    )
+    return hashlib.sha256(material.encode()).hexdigest()
 
-AUDIENCE & CONTEXT:
-{audience_notes or "General technical audience"}
 
-TAGS: {', '.join(tags) if tags else "None specified"}
+SYSTEM_PROMPT = """You are a writing assistant helping analyze a blog post one paragraph at a time.
 
-{"FULL POST:" if is_last else "PREVIOUS PARAGRAPHS:"}
-{full_context if full_context.strip() else "(This is the first paragraph)"}
-
-CURRENT PARAGRAPH TO ANALYZE:
-{paragraph}
+You will be given the audience notes, the tags and the full post with numbered paragraphs, followed by the paragraph to analyze. Judge each paragraph only against the paragraphs that come before it, unless asked to consider the full post.
 
 Please provide feedback in JSON format with these fields:
 - "summary": Brief summary of what this paragraph does (1 sentence)
@@ -46,79 +153,280 @@ Please provide feedback in JSON format with these fields:
 Respond only with valid JSON."""
 
 
-async def analyze_paragraph(
-    paragraph: str,
-    context: str,
+def build_analysis_prefix(
+    paragraphs: list[str],
     audience_notes: str,
     tags: list[str],
+) -> str:
+    """Build the part of the prompt shared by every paragraph of a post.
+
+    It is identical for all requests in a run, so the API can cache it and
+    each request only pays full price for the paragraph under review.
+    """
+    numbered = "\n\n".join(f"[{i + 1}] {p}" for i, p in enumerate(paragraphs))
+    return f"""AUDIENCE & CONTEXT:
+{audience_notes or "General technical audience"}
+
+TAGS: {', '.join(tags) if tags else "None specified"}
+
+FULL POST:
+{numbered}"""
+
+
+def build_analysis_prompt(paragraph: str, index: int, is_last: bool) -> str:
+    """Build the per-paragraph part of the analysis prompt."""
+    if is_last:
+        scope = "This is the last paragraph; consider the full post."
+    elif index == 0:
+        scope = "This is the first paragraph; there is no previous content."
+    else:
+        scope = f"Consider only paragraphs [1] to [{index}] as previous content."
+
+    return f"""CURRENT PARAGRAPH TO ANALYZE: [{index + 1}]
+{paragraph}
+
+{scope}"""
+
+
+def _retry_delay(response: httpx.Response, attempt: int) -> float:
+    """Delay before the next attempt: Retry-After if given, else jittered backoff."""
+    retry_after = response.headers.get("retry-after")
+    if retry_after:
+        try:
+            return min(float(retry_after), AI_RETRY_MAX_DELAY)
+        except ValueError:
+            pass
+    delay = min(AI_RETRY_BASE_DELAY * 2**attempt, AI_RETRY_MAX_DELAY)
+    return delay * random.uniform(0.5, 1.0)
+
+
+async def _post_with_retry(
+    client: httpx.AsyncClient,
+    headers: dict,
+    payload: dict,
+    max_retries: int = AI_MAX_RETRIES,
+) -> httpx.Response:
+    """POST to the messages API, retrying rate-limit and overload responses."""
+    for attempt in range(max_retries + 1):
+        response = await client.post(API_URL, headers=headers, json=payload)
+        if response.status_code not in RETRY_STATUS_CODES or attempt == max_retries:
+            break
+        await asyncio.sleep(_retry_delay(response, attempt))
+    response.raise_for_status()
+    return response
+
+
+async def analyze_paragraph(
+    prefix: str,
+    paragraph: str,
+    index: int,
     is_last: bool,
+    usage: Optional[TokenUsage] = None,
 ) -> dict:
-    """Analyze a paragraph with context."""
-    api_key = get_api_key()
-    prompt = build_analysis_prompt(paragraph, context, audience_notes, tags, is_last)
-
-    async with httpx.AsyncClient() as client:
-        response = await client.post(
-            API_URL,
-            headers={
-                "x-api-key": api_key,
-                "anthropic-version": "2023-06-01",
-                "Content-Type": "application/json",
-            },
-            json={
-                "model": MODEL,
-                "max_tokens": 1024,
-                "messages": [{"role": "user", "content": prompt}],
-            },
-            timeout=60.0,
-        )
-        response.raise_for_status()
-        data = response.json()
-
-        content = data["content"][0]["text"].strip()
-        if content.startswith("```"):
-            lines = content.split("\n")
-            lines = lines[1:]  # Remove opening ```json or ```
-            if lines and lines[-1].strip() == "```":
-                lines = lines[:-1]  # Remove closing ```
-            content = "\n".join(lines)
-        try:
-            return json.loads(content)
-        except json.JSONDecodeError:
-            return {
-                "summary": "Failed to parse AI response",
-                "suggestions": [],
-                "overall_rating": "needs_work",
-                "flow_with_context": content[:200],
-                "raw_response": content,
-            }
+    """Analyze a paragraph against the shared post prefix."""
+    response = await _post_with_retry(
+        _get_client(),
+        headers={
+            "x-api-key": _get_api_key(),
+            "anthropic-version": "2023-06-01",
+            "Content-Type": "application/json",
+        },
+        payload={
+            "model": MODEL,
+            "max_tokens": 1024,
+            "system": SYSTEM_PROMPT,
+            "messages": [
+                {
+                    "role": "user",
+                    "content": [
+                        {
+                            "type": "text",
+                            "text": prefix,
+                            "cache_control": {"type": "ephemeral"},
+                        },
+                        {
+                            "type": "text",
+                            "text": build_analysis_prompt(paragraph, index, is_last),
+                        },
+                    ],
+                }
+            ],
+        },
+    )
+    data = response.json()
+    if usage is not None:
+        usage.add(data.get("usage") or {})
 
+    content = data["content"][0]["text"].strip()
+    if content.startswith("```"):
+        lines = content.split("\n")
+        lines = lines[1:]  # Remove opening ```json or ```
+        if lines and lines[-1].strip() == "```":
+            lines = lines[:-1]  # Remove closing ```
+        content = "\n".join(lines)
+    try:
+        return json.loads(content)
+    except json.JSONDecodeError:
+        return {
+            "summary": "Failed to parse AI response",
+            "suggestions": [],
+            "overall_rating": "needs_work",
+            "flow_with_context": content[:200],
+            "raw_response": content,
+        }
 
-async def analyze_all_paragraphs(
+
+def split_paragraphs(content: str) -> list[str]:
+    """Split Markdown content into the paragraphs that get analysed."""
+    return [p.strip() for p in content.split("\n\n") if p.strip()]
+
+
+def analysis_settings_hash(audience_notes: str, tags: list[str]) -> str:
+    """Hash the inputs shared by every paragraph of an analysis run."""
+    material = json.dumps([audience_notes, tags, MODEL, PROMPT_VERSION])
+    return hashlib.sha256(material.encode()).hexdigest()[:16]
+
+
+def reusable_analyses(
+    paragraphs: list[str], previous: list[dict], settings: str, context_window: int
+) -> dict[int, dict]:
+    """Map new paragraph indexes to previous analyses that are still valid.
+
+    A previous analysis is kept when it was made with the same settings,
+    its paragraph is unchanged, the ``context_window`` paragraphs before it
+    are unchanged, and it is still (or still is not) the first and the
+    last paragraph.
+    """
+    old = [item.get("paragraph_text", "") for item in previous]
+    matcher = difflib.SequenceMatcher(a=old, b=paragraphs, autojunk=False)
+    reusable = {}
+    for block in matcher.get_matching_blocks():
+        for offset in range(block.size):
+            k, j = block.a + offset, block.b + offset
+            item = previous[k]
+            if item.get("analysis_settings") != settings or "raw_response" in item:
+                continue
+            if (k == 0) != (j == 0) or (k == len(old) - 1) != (j == len(paragraphs) - 1):
+                continue
+            w = context_window
+            if old[max(0, k - w):k] != paragraphs[max(0, j - w):j]:
+                continue
+            reusable[j] = item
+    return reusable
+
+
+async def iter_paragraph_analyses(
     content: str,
     audience_notes: str,
     tags: list[str],
-) -> list[dict]:
-    """Analyze all paragraphs with accumulating context."""
-    paragraphs = [p.strip() for p in content.split("\n\n") if p.strip()]
+    max_concurrency: int = AI_MAX_CONCURRENCY,
+    previous: Optional[list[dict]] = None,
+    context_window: int = AI_CONTEXT_WINDOW,
+    usage: Optional[TokenUsage] = None,
+) -> AsyncIterator[dict]:
+    """Yield each paragraph's analysis as soon as it is ready.
+
+    Every request shares one cacheable prefix (audience notes, tags and the
+    numbered post). The first request goes out alone to write that prefix
+    to the API's prompt cache; the rest then run concurrently (at most
+    ``max_concurrency`` in flight) and read it back. Results arrive in
+    completion order, tagged with ``paragraph_index``. Paragraphs whose
+    text, context and settings were analysed before are served from the
+    local analysis cache. Token counts are added to ``usage`` if given.
+
+    When ``previous`` (a stored analysis of an earlier version) is given,
+    only edited or inserted paragraphs, and those whose nearby context
+    changed, are re-analysed; the rest keep their previous results.
+    """
+    paragraphs = split_paragraphs(content)
 
     if not paragraphs:
-        return []
+        return
+
+    settings = analysis_settings_hash(audience_notes, tags)
+    reused = (
+        reusable_analyses(paragraphs, previous, settings, context_window)
+        if previous
+        else {}
+    )
 
-    results = []
+    jobs = []
     for i, paragraph in enumerate(paragraphs):
         context = "\n\n".join(paragraphs[:i])
         is_last = i == len(paragraphs) - 1
+        key = analysis_cache_key(paragraph, context, audience_notes, tags, is_last)
+        jobs.append((i, paragraph, context, is_last, key))
 
-        result = await analyze_paragraph(
-            paragraph=paragraph,
-            context=context,
-            audience_notes=audience_notes,
-            tags=tags,
-            is_last=is_last,
-        )
+    cached = await db.get_cached_analyses([job[4] for job in jobs])
+    fresh: dict[str, dict] = {}
+    semaphore = asyncio.Semaphore(max(1, max_concurrency))
+    prefix = build_analysis_prefix(paragraphs, audience_notes, tags)
+    prefix_written = asyncio.Event()
+    first_request = True
+
+    async def analyze(i: int, paragraph: str, context: str, is_last: bool, key: str) -> dict:
+        if i in reused:
+            result = dict(reused[i])
+        elif key in cached:
+            cache_stats.hits += 1
+            result = dict(cached[key])
+        else:
+            nonlocal first_request
+            cache_stats.misses += 1
+            leader, first_request = first_request, False
+            if not leader:
+                await prefix_written.wait()
+            try:
+                async with semaphore:
+                    result = await analyze_paragraph(
+                        prefix=prefix,
+                        paragraph=paragraph,
+                        index=i,
+                        is_last=is_last,
+                        usage=usage,
+                    )
+            finally:
+                if leader:
+                    prefix_written.set()
+            if "raw_response" not in result:
+                fresh[key] = dict(result)
         result["paragraph_index"] = i
         result["paragraph_text"] = paragraph
-        results.append(result)
+        result["analysis_settings"] = settings
+        return result
 
-    return results
+    tasks = [asyncio.create_task(analyze(*job)) for job in jobs]
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            yield await next_done
+    finally:
+        # Stop outstanding requests if the consumer went away or one failed,
+        # but keep whatever was already paid for
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        await db.put_cached_analyses(fresh)
+        if fresh:
+            await db.evict_analysis_cache(AI_CACHE_MAX_ENTRIES, AI_CACHE_MAX_AGE_DAYS)
+
+
+async def analyze_all_paragraphs(
+    content: str,
+    audience_notes: str,
+    tags: list[str],
+    max_concurrency: int = AI_MAX_CONCURRENCY,
+    previous: Optional[list[dict]] = None,
+    context_window: int = AI_CONTEXT_WINDOW,
+    usage: Optional[TokenUsage] = None,
+) -> list[dict]:
+    """Analyze all paragraphs and return the results in paragraph order.
+
+    See iter_paragraph_analyses() for how work is shared and reused.
+    """
+    results = [
+        result
+        async for result in iter_paragraph_analyses(
+            content, audience_notes, tags, max_concurrency, previous, context_window, usage
+        )
+    ]
+    return sorted(results, key=lambda result: result["paragraph_index"])
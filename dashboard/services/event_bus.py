@@ -0,0 +1,133 @@
+"""In-memory progress events for background jobs."""
+
+import asyncio
+import json
+import uuid
+from collections import OrderedDict, deque
+from dataclasses import dataclass
+from typing import AsyncIterator, Awaitable, Callable
+
+from ..config import JOB_EVENT_BUFFER, JOB_HISTORY
+
+
+@dataclass
+class JobEvent:
+    id: int
+    data: dict
+
+
+class JobChannel:
+    """Events for one job, in a bounded ring buffer.
+
+    Any number of subscribers can read a channel. Each gets the buffered
+    events after the id it last saw and then follows new ones live. Once
+    the ring wraps, a subscriber that fell behind skips the dropped events.
+    """
+
+    def __init__(self, job_id: str, kind: str, capacity: int = JOB_EVENT_BUFFER):
+        self.job_id = job_id
+        self.kind = kind
+        self.closed = False
+        self._events: deque[JobEvent] = deque(maxlen=capacity)
+        self._next_id = 1
+        self._wakeup = asyncio.Event()
+
+    @property
+    def last_event_id(self) -> int:
+        return self._next_id - 1
+
+    def publish(self, data: dict) -> int:
+        """Append an event and wake every subscriber. Returns its id."""
+        event = JobEvent(self._next_id, data)
+        self._next_id += 1
+        self._events.append(event)
+        self._wake()
+        return event.id
+
+    def close(self):
+        """Mark the job finished; subscribers stop after the last event."""
+        self.closed = True
+        self._wake()
+
+    def _wake(self):
+        self._wakeup.set()
+        self._wakeup = asyncio.Event()
+
+    def events_after(self, last_event_id: int) -> list[JobEvent]:
+        return [event for event in self._events if event.id > last_event_id]
+
+    async def subscribe(self, last_event_id: int = 0) -> AsyncIterator[JobEvent]:
+        """Yield events after last_event_id, following the job until it closes."""
+        while True:
+            # Grab the event before reading, so a publish in between still wakes us
+            wakeup = self._wakeup
+            for event in self.events_after(last_event_id):
+                last_event_id = event.id
+                yield event
+            if self.closed:
+                return
+            await wakeup.wait()
+
+
+class EventBus:
+    """Runs jobs in the background and keeps their event channels.
+
+    Running jobs are always kept; the ``history`` most recent finished ones
+    stay around so that clients can still replay how they ended.
+    """
+
+    def __init__(self, history: int = JOB_HISTORY):
+        self.history = history
+        self._channels: OrderedDict[str, JobChannel] = OrderedDict()
+        self._tasks: set[asyncio.Task] = set()
+
+    def open(self, kind: str) -> JobChannel:
+        """Register a channel for a job run elsewhere, which closes it when done."""
+        channel = JobChannel(uuid.uuid4().hex[:12], kind)
+        self._channels[channel.job_id] = channel
+        self._prune()
+        return channel
+
+    def start(self, kind: str, job: Callable[[JobChannel], Awaitable[None]]) -> JobChannel:
+        """Run ``job(channel)`` as a task; the channel closes when it returns."""
+        channel = self.open(kind)
+
+        async def run():
+            try:
+                await job(channel)
+            finally:
+                channel.close()
+
+        task = asyncio.create_task(run(), name=f"job-{channel.job_id}")
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return channel
+
+    def get(self, job_id: str) -> JobChannel | None:
+        return self._channels.get(job_id)
+
+    def running(self, kind: str | None = None) -> list[JobChannel]:
+        """Jobs that have not finished, oldest first."""
+        return [
+            channel for channel in self._channels.values()
+            if not channel.closed and (kind is None or channel.kind == kind)
+        ]
+
+    def _prune(self):
+        finished = [job_id for job_id, channel in self._channels.items() if channel.closed]
+        for job_id in finished[:max(0, len(finished) - self.history)]:
+            del self._channels[job_id]
+
+    async def stop(self):
+        """Cancel running jobs and wait for them to exit."""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+
+
+def format_sse(event: JobEvent) -> str:
+    """Encode an event as a Server-Sent Events message with its id."""
+    return f"id: {event.id}\ndata: {json.dumps(event.data)}\n\n"
+
+
+event_bus = EventBus()
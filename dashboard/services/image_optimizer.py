@@ -0,0 +1,269 @@
+"""Responsive variants of uploaded images, built in worker processes."""
+
+import asyncio
+import logging
+import multiprocessing
+import os
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Iterable
+
+try:
+    from PIL import Image, ImageOps, JpegImagePlugin
+except ImportError:  # optional: pip install 'blog-dashboard[images]'
+    Image = None
+
+from .. import db
+from ..config import IMAGE_QUALITY, IMAGE_WIDTHS, IMAGE_WORKERS, MEDIA_TMP_DIR
+
+logger = logging.getLogger(__name__)
+
+# Pillow format names for the uploads we re-encode. GIFs are left alone so
+# animations survive.
+SOURCE_FORMATS = {
+    "image/jpeg": "JPEG",
+    "image/png": "PNG",
+    "image/webp": "WEBP",
+}
+# Extra encodings offered through <picture>, best compression first
+MODERN_FORMATS = {
+    "image/avif": ("AVIF", ".avif"),
+    "image/webp": ("WEBP", ".webp"),
+}
+
+
+def _encodable(pil_format: str) -> bool:
+    # AVIF needs Pillow 11.2+ built with libavif, or pillow-avif-plugin
+    Image.init()
+    return pil_format in Image.SAVE
+
+
+def _convert_for(image: "Image.Image", pil_format: str) -> "Image.Image":
+    if pil_format == "JPEG":
+        return image if image.mode in ("RGB", "L") else image.convert("RGB")
+    if image.mode in ("RGB", "RGBA") or pil_format == "PNG":
+        return image
+    transparent = "A" in image.getbands() or "transparency" in image.info
+    return image.convert("RGBA" if transparent else "RGB")
+
+
+def _save(
+    image: "Image.Image",
+    path: Path,
+    pil_format: str,
+    quality: int,
+    tmp_dir: Path,
+    **encoder_options,
+) -> int:
+    """Write image to path atomically, without metadata. Returns the file size.
+
+    The file is written in tmp_dir first, so a half-written variant never
+    sits in the repository.
+    """
+    tmp_path = tmp_dir / f"{uuid.uuid4().hex}{path.suffix}.part"
+    options = {"quality": quality}
+    if pil_format == "JPEG":
+        options.update(optimize=True, progressive=True)
+        if "qtables" in encoder_options:
+            del options["quality"]
+        options.update(encoder_options)
+    elif pil_format == "PNG":
+        options = {"optimize": True}
+    icc_profile = image.info.get("icc_profile")
+    if icc_profile:
+        options["icc_profile"] = icc_profile
+    try:
+        _convert_for(image, pil_format).save(tmp_path, pil_format, **options)
+        os.replace(tmp_path, path)
+    finally:
+        tmp_path.unlink(missing_ok=True)
+    return path.stat().st_size
+
+
+def _open_stripped(source: Path) -> "Image.Image":
+    with Image.open(source) as opened:
+        # Bake the EXIF orientation into the pixels before dropping EXIF
+        image = ImageOps.exif_transpose(opened)
+        image.load()
+    # Only the colour profile is worth keeping; location, camera and the
+    # like go
+    image.info = {key: value for key, value in image.info.items() if key == "icc_profile"}
+    return image
+
+
+def strip_metadata(path: str, media_type: str, quality: int, tmp_dir: str) -> None:
+    """Rewrite the image at path upright and without metadata, in place.
+
+    Runs in a worker process, on an upload before it is hashed and stored,
+    so the file served as the original never carries location or camera
+    details. A JPEG is re-encoded with its own quantisation tables, which
+    keeps the loss of a second generation small.
+    """
+    source = Path(path)
+    tmp = Path(tmp_dir)
+    tmp.mkdir(parents=True, exist_ok=True)
+    encoder_options = {}
+    with Image.open(source) as opened:
+        if opened.format == "JPEG":
+            encoder_options = {
+                "qtables": opened.quantization,
+                "subsampling": JpegImagePlugin.get_sampling(opened),
+            }
+    image = _open_stripped(source)
+    _save(image, source, SOURCE_FORMATS[media_type], quality, tmp, **encoder_options)
+
+
+def build_variants(
+    path: str, media_type: str, widths: tuple[int, ...], quality: int, tmp_dir: str
+) -> list[dict]:
+    """Write metadata-free, resized copies of the image at path beside it.
+
+    Runs in a worker process. Every width up to the image's own gets a copy
+    in the source format and in each modern format. The image itself is
+    left as stored, so its name still matches the hash of its bytes.
+    Returns a description of each file written.
+    """
+    source = Path(path)
+    tmp = Path(tmp_dir)
+    tmp.mkdir(parents=True, exist_ok=True)
+    image = _open_stripped(source)
+
+    width, height = image.size
+    source_format = SOURCE_FORMATS[media_type]
+    variants = []
+    sizes = sorted({w for w in widths if w < width} | {width})
+    for target in sizes:
+        resized = image
+        if target != width:
+            resized = image.resize(
+                (target, max(1, round(height * target / width))), Image.Resampling.LANCZOS
+            )
+        encodings = [(media_type, source_format, source.suffix)] + [
+            (variant_type, pil_format, suffix)
+            for variant_type, (pil_format, suffix) in MODERN_FORMATS.items()
+            if variant_type != media_type and _encodable(pil_format)
+        ]
+        for variant_type, pil_format, suffix in encodings:
+            variant_path = source.with_name(f"{source.stem}-{target}w{suffix}")
+            variants.append({
+                "filename": variant_path.name,
+                "media_type": variant_type,
+                "width": resized.width,
+                "height": resized.height,
+                "size": _save(resized, variant_path, pil_format, quality, tmp),
+            })
+    return variants
+
+
+class ImageOptimizer:
+    """Builds responsive variants of uploaded images off the event loop.
+
+    Uploads are cleaned of metadata with ``strip`` before they are stored,
+    then queued with ``schedule``. Both run in a process pool, so resizing
+    a large photo neither blocks requests nor competes with them for the
+    GIL. The variants written are recorded in the database for the
+    publisher. Without Pillow installed this does nothing and images are
+    stored and published as uploaded.
+    """
+
+    def __init__(
+        self,
+        workers: int = IMAGE_WORKERS,
+        widths: tuple[int, ...] = IMAGE_WIDTHS,
+        quality: int = IMAGE_QUALITY,
+        tmp_dir: Path = MEDIA_TMP_DIR,
+    ):
+        self.workers = workers
+        self.widths = widths
+        self.quality = quality
+        self.tmp_dir = tmp_dir
+        self._executor: ProcessPoolExecutor | None = None
+        self._pending: dict[str, asyncio.Task] = {}
+
+    @property
+    def available(self) -> bool:
+        return Image is not None and self.workers > 0
+
+    def _pool(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            # Forking a process that runs database threads is unsafe
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers, mp_context=multiprocessing.get_context("spawn")
+            )
+        return self._executor
+
+    async def strip(self, path: Path, media_type: str) -> bool:
+        """Remove metadata from an upload in place, if it is an image we handle.
+
+        Returns whether the file was rewritten. An image Pillow cannot read
+        is left as it is.
+        """
+        if not self.available or media_type not in SOURCE_FORMATS:
+            return False
+        loop = asyncio.get_running_loop()
+        try:
+            await loop.run_in_executor(
+                self._pool(),
+                strip_metadata,
+                str(path),
+                media_type,
+                self.quality,
+                str(self.tmp_dir),
+            )
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            logger.exception("Stripping metadata from %s failed", path.name)
+            return False
+        return True
+
+    def schedule(self, content_hash: str, path: Path, media_type: str):
+        """Build variants of a newly stored file in the background, if it is an image we handle."""
+        if not self.available or media_type not in SOURCE_FORMATS:
+            return
+        if content_hash in self._pending:
+            return
+        task = asyncio.create_task(self.optimize(content_hash, path, media_type))
+        self._pending[content_hash] = task
+        task.add_done_callback(lambda _: self._pending.pop(content_hash, None))
+
+    async def optimize(self, content_hash: str, path: Path, media_type: str) -> list[dict]:
+        """Build and record the variants of a stored image."""
+        loop = asyncio.get_running_loop()
+        try:
+            variants = await loop.run_in_executor(
+                self._pool(),
+                build_variants,
+                str(path),
+                media_type,
+                self.widths,
+                self.quality,
+                str(self.tmp_dir),
+            )
+            await db.replace_image_variants(content_hash, variants)
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            logger.exception("Optimising %s failed", path.name)
+            return []
+        return variants
+
+    async def wait_for(self, hashes: Iterable[str]):
+        """Wait until the given stored images have been processed."""
+        tasks = [self._pending[h] for h in hashes if h in self._pending]
+        if tasks:
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def stop(self):
+        """Cancel queued work and shut the worker processes down."""
+        tasks = list(self._pending.values())
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+image_optimizer = ImageOptimizer()
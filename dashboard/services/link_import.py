@@ -0,0 +1,95 @@
+"""Parse reading lists for bulk import into the link queue."""
+
+import xml.etree.ElementTree as ET
+from html.parser import HTMLParser
+from urllib.parse import urlsplit
+
+# OPML outline attributes that may hold a link, in order of preference
+OPML_URL_ATTRIBUTES = ("htmlUrl", "url", "xmlUrl")
+
+
+def _is_web_url(url: str) -> bool:
+    parts = urlsplit(url)
+    return parts.scheme in ("http", "https") and bool(parts.netloc)
+
+
+def _split_tags(value: str | None) -> list[str]:
+    if not value:
+        return []
+    return [t.strip().lstrip("#") for t in value.replace(",", " ").split() if t.strip()]
+
+
+class _BookmarkParser(HTMLParser):
+    """Collects <a href> links, and their TAGS, from a Netscape bookmarks file."""
+
+    def __init__(self):
+        super().__init__()
+        self.links: list[tuple[str, list[str]]] = []
+
+    def handle_starttag(self, tag, attrs):
+        if tag != "a":
+            return
+        attrs = dict(attrs)
+        if attrs.get("href"):
+            self.links.append((attrs["href"].strip(), _split_tags(attrs.get("tags"))))
+
+
+def _parse_opml(text: str) -> list[tuple[str, list[str]]]:
+    try:
+        root = ET.fromstring(text)
+    except ET.ParseError as e:
+        raise ValueError(f"invalid OPML: {e}") from e
+    links = []
+    for outline in root.iter("outline"):
+        for attribute in OPML_URL_ATTRIBUTES:
+            if outline.get(attribute):
+                url = outline.get(attribute).strip()
+                links.append((url, _split_tags(outline.get("category"))))
+                break
+    return links
+
+
+def _parse_bookmarks(text: str) -> list[tuple[str, list[str]]]:
+    parser = _BookmarkParser()
+    parser.feed(text)
+    parser.close()
+    return parser.links
+
+
+def _parse_lines(text: str) -> list[tuple[str, list[str]]]:
+    links = []
+    for line in text.splitlines():
+        line = line.strip()
+        if line and not line.startswith("#"):
+            url, _, tags = line.partition(" ")
+            links.append((url, _split_tags(tags)))
+    return links
+
+
+def parse_links(
+    text: str, tags: list[str] | None = None
+) -> tuple[list[tuple[str, list[str]]], int]:
+    """Extract (url, tags) pairs from an import file.
+
+    Accepts OPML, a browser bookmarks export, or one URL per line (optionally
+    followed by tags; lines starting with # are skipped). tags are added to
+    every link. Returns the links and the number of entries that were not
+    http(s) URLs. Raises ValueError for malformed OPML.
+    """
+    head = text.lstrip()[:512].lower()
+    if "<opml" in head:
+        found = _parse_opml(text)
+    elif head.startswith("<!doctype netscape-bookmark-file") or "<a " in text[:4096].lower():
+        found = _parse_bookmarks(text)
+    else:
+        found = _parse_lines(text)
+
+    extra = tags or []
+    links = []
+    invalid = 0
+    for url, link_tags in found:
+        if not _is_web_url(url):
+            invalid += 1
+            continue
+        links.append((url, list(dict.fromkeys(link_tags + extra))))
+    return links, invalid
@@ -0,0 +1,277 @@
+"""Background worker pool that drains the link queue."""
+
+import asyncio
+import json
+import logging
+
+from .. import db
+from ..config import LINK_BATCH_SIZE, LINK_BATCH_WINDOW, LINK_POLL_INTERVAL, LINK_WORKERS
+from .event_bus import JobChannel, event_bus
+from .llog_runner import STAGE_MESSAGES, LlogResult, llog_runner, stage_reached
+
+logger = logging.getLogger(__name__)
+
+# Checkpoints a retry can resume from. A link past PREPARED_STAGE has its
+# entry saved in the database; a link past PUSHED_STAGE is already in the
+# pushed site and only needs its deployment checked. Anything in between
+# is rolled back by llog.js when it fails.
+PREPARED_STAGE = "suggesting_tags"
+PUSHED_STAGE = "pushed"
+
+
+def _error_output(result: LlogResult) -> str:
+    return f"STDOUT:\n{result.stdout}\n\nSTDERR:\n{result.stderr}"
+
+
+class LinkWorkerPool:
+    """Claims pending links and processes several of them at once.
+
+    Fetching, summarising and tagging run concurrently in the workers. The
+    prepared entries are handed to a single publisher, which coalesces them
+    into batches so that one site build, commit, push and deployment check
+    covers up to ``batch_size`` links.
+
+    Each link's stage is recorded as llog.js reports it, and the prepared
+    entry is checkpointed, so a retried link picks up after the last stage
+    that survived the failure instead of starting again.
+
+    Every link being processed has an ``event_bus`` channel of kind
+    "link", which gets its stages and outcome, so any client can attach to
+    it and replay its progress.
+    """
+
+    def __init__(
+        self,
+        concurrency: int = LINK_WORKERS,
+        poll_interval: float = LINK_POLL_INTERVAL,
+        batch_size: int = LINK_BATCH_SIZE,
+        batch_window: float = LINK_BATCH_WINDOW,
+    ):
+        self.concurrency = concurrency
+        self.poll_interval = poll_interval
+        self.batch_size = max(1, batch_size)
+        self.batch_window = batch_window
+        self._tasks: list[asyncio.Task] = []
+        self._wakeup = asyncio.Event()
+        self._prepared: asyncio.Queue[tuple[dict, dict]] = asyncio.Queue()
+        self._channels: dict[int, JobChannel] = {}
+
+    async def start(self):
+        """Requeue links orphaned by a previous run and start the workers."""
+        if self._tasks or self.concurrency <= 0:
+            return
+        requeued = await db.requeue_stale_links()
+        if requeued:
+            logger.info("Requeued %d link(s) left in processing", requeued)
+        self._tasks = [
+            asyncio.create_task(self._worker(), name=f"link-worker-{i}")
+            for i in range(self.concurrency)
+        ]
+        self._tasks.append(asyncio.create_task(self._publisher(), name="link-publisher"))
+
+    async def stop(self):
+        """Cancel the workers and wait for them to exit."""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def notify(self):
+        """Wake idle workers, e.g. after a link was queued."""
+        self._wakeup.set()
+
+    async def _wait_for_work(self):
+        try:
+            await asyncio.wait_for(self._wakeup.wait(), timeout=self.poll_interval)
+        except asyncio.TimeoutError:
+            pass
+        self._wakeup.clear()
+
+    async def _worker(self):
+        while True:
+            link = await db.claim_next_pending_link()
+            if not link:
+                await self._wait_for_work()
+                continue
+            self._track(link)
+            try:
+                await self.resume(link)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.exception("Preparing link %s failed", link["id"])
+                await self._finish(link["id"], "failed", error_message=str(e))
+
+    def _track(self, link: dict, channel: JobChannel | None = None) -> JobChannel:
+        """Give a claimed link a channel, a new one unless one is passed in."""
+        if channel is None:
+            channel = event_bus.open("link")
+        channel.publish({"type": "start", "link_id": link["id"], "url": link["url"]})
+        self._channels[link["id"]] = channel
+        return channel
+
+    def _stage_recorder(self, link_ids: list[int]):
+        async def record(stage: str):
+            await db.update_link_stage(link_ids, stage)
+            for link_id in link_ids:
+                if channel := self._channels.get(link_id):
+                    channel.publish(
+                        {"type": "progress", "stage": stage, "message": STAGE_MESSAGES[stage]}
+                    )
+        return record
+
+    async def _finish(self, link_id: int, status: str, **details):
+        """Record a link's outcome and end its channel."""
+        await db.update_link_status(link_id, status, **details)
+        channel = self._channels.pop(link_id, None)
+        if channel is None:
+            return
+        event = {"type": "complete", "success": status == "completed", "link_id": link_id}
+        if status != "completed":
+            event["error"] = details.get("error_message")
+        channel.publish(event)
+        channel.close()
+
+    async def resume(self, link: dict):
+        """Continue a claimed link from its last checkpoint."""
+        entry = json.loads(link["prepared_entry"]) if link.get("prepared_entry") else None
+        if entry is None:
+            entry = await self.prepare(link)
+            if entry is not None:
+                await self._prepared.put((link, entry))
+        elif stage_reached(link.get("stage"), PUSHED_STAGE):
+            await self.verify(link, entry)
+        else:
+            logger.info("Link %s resumes from its prepared entry", link["id"])
+            await self._prepared.put((link, entry))
+
+    async def process(self, link: dict, channel: JobChannel | None = None):
+        """Take a claimed link through its remaining stages now, on its own.
+
+        Used for manual processing. Resumes from the last checkpoint like
+        ``resume``, but publishes the link by itself instead of waiting for
+        a batch. Progress goes to ``channel`` if given, else to a new one.
+        """
+        self._track(link, channel)
+        try:
+            entry = json.loads(link["prepared_entry"]) if link.get("prepared_entry") else None
+            if entry is None:
+                entry = await self.prepare(link)
+                if entry is None:
+                    return
+            elif stage_reached(link.get("stage"), PUSHED_STAGE):
+                await self.verify(link, entry)
+                return
+            await self.publish([(link, entry)])
+        except Exception as e:
+            logger.exception("Processing link %s failed", link["id"])
+            await self._finish(link["id"], "failed", error_message=str(e))
+
+    async def prepare(self, link: dict) -> dict | None:
+        """Fetch and summarise a claimed link and checkpoint its entry.
+
+        Returns the prepared entry, or None if the link failed.
+        """
+        tags = json.loads(link["tags"]) if link["tags"] else []
+
+        prepared = await llog_runner.prepare_link(
+            link["url"], tags, on_stage=self._stage_recorder([link["id"]])
+        )
+        if not prepared.success:
+            await db.update_link_stage([link["id"]], None)
+            await self._finish(
+                link["id"],
+                "failed",
+                error_message=f"Exit code: {prepared.return_code}",
+                error_output=_error_output(prepared),
+            )
+            return None
+
+        await db.save_prepared_entry(link["id"], prepared.entry, PREPARED_STAGE)
+        return prepared.entry
+
+    async def verify(self, link: dict, entry: dict):
+        """Re-check the deployment of a link whose entry was already pushed."""
+        result = await llog_runner.verify_entries(
+            [entry], on_stage=self._stage_recorder([link["id"]])
+        )
+        if result.success:
+            await self._finish(link["id"], "completed")
+        else:
+            await db.update_link_stage([link["id"]], PUSHED_STAGE)
+            await self._finish(
+                link["id"],
+                "failed",
+                error_message="Deployment not verified",
+                error_output=_error_output(result),
+            )
+
+    async def _next_batch(self) -> list[tuple[dict, dict]]:
+        """Wait for a prepared link, then gather more for up to batch_window."""
+        batch = [await self._prepared.get()]
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.batch_window
+        while len(batch) < self.batch_size:
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._prepared.get(), remaining))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _publisher(self):
+        while True:
+            batch = await self._next_batch()
+            try:
+                await self.publish(batch)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.exception("Publishing %d link(s) failed", len(batch))
+                for link, _ in batch:
+                    await self._finish(link["id"], "failed", error_message=str(e))
+
+    async def publish(self, batch: list[tuple[dict, dict]]):
+        """Publish prepared links together and record each link's outcome."""
+        link_ids = [link["id"] for link, _ in batch]
+        recorder = self._stage_recorder(link_ids)
+        reached = None
+
+        async def record(stage: str):
+            nonlocal reached
+            reached = stage
+            await recorder(stage)
+
+        result = await llog_runner.publish_entries(
+            [entry for _, entry in batch], on_stage=record
+        )
+
+        if not result.success:
+            # Unless the push went through, llog.js has rolled everything
+            # back to the prepared entries
+            pushed = stage_reached(reached, PUSHED_STAGE)
+            checkpoint = PUSHED_STAGE if pushed else PREPARED_STAGE
+            await db.update_link_stage(link_ids, checkpoint)
+            for link, _ in batch:
+                await self._finish(
+                    link["id"],
+                    "failed",
+                    error_message=(
+                        "Deployment not verified" if pushed
+                        else f"Exit code: {result.return_code}"
+                    ),
+                    error_output=_error_output(result),
+                )
+            return
+
+        skipped = {item["id"]: item["reason"] for item in result.skipped}
+        for link, entry in batch:
+            if entry["id"] in skipped:
+                await self._finish(link["id"], "failed", error_message=skipped[entry["id"]])
+            else:
+                await self._finish(link["id"], "completed")
+
+
+link_worker_pool = LinkWorkerPool()
@@ -0,0 +1,51 @@
+"""Mirror of the published linklog in the dashboard database."""
+
+import asyncio
+import json
+import logging
+from pathlib import Path
+
+from .. import db
+from ..config import LINKLOG_FILE
+
+logger = logging.getLogger(__name__)
+
+
+class LinklogIndex:
+    """Reloads linklog.json into the database whenever the file changes.
+
+    The mirror backs duplicate checks and search. The file is written by
+    llog.js, from the dashboard or the command line, so rather than hooking
+    every writer the mirror checks the file's modification time before it
+    is used.
+    """
+
+    def __init__(self, path: Path = LINKLOG_FILE):
+        self.path = path
+        self._mtime: float | None = None
+        self._lock = asyncio.Lock()
+
+    def _load(self) -> list[dict]:
+        data = json.loads(self.path.read_text(encoding="utf-8"))
+        return data.get("entries", [])
+
+    async def sync(self) -> bool:
+        """Reload the linklog if it changed. Returns True if it did."""
+        async with self._lock:
+            try:
+                mtime = self.path.stat().st_mtime
+            except FileNotFoundError:
+                return False
+            if mtime == self._mtime:
+                return False
+            try:
+                entries = await asyncio.to_thread(self._load)
+            except (OSError, ValueError):
+                logger.exception("Could not read %s", self.path)
+                return False
+            await db.replace_linklog_entries(entries)
+            self._mtime = mtime
+            return True
+
+
+linklog_index = LinklogIndex()
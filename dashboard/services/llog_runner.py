@@ -1,11 +1,15 @@
 """Service for running llog.js to process links with real-time progress."""
 
 import asyncio
+import json
+import os
 import re
+import tempfile
 from dataclasses import dataclass, field
-from typing import AsyncIterator
+from pathlib import Path
+from typing import Awaitable, Callable
 
-from ..config import PROJECT_ROOT, LLOG_SCRIPT
+from ..config import PROJECT_ROOT, LLOG_SCRIPT, SITE_BUILD_URL, SITE_BUILDER
 
 PROGRESS_STAGES = [
     ("📝", "acquired_lock", "Acquiring lock..."),
@@ -26,6 +30,17 @@ PROGRESS_STAGES = [
     ("🎉", "completed", "Complete!"),
 ]
 
+# Position of each stage in the pipeline, for comparing how far a link got
+STAGE_ORDER = {stage: index for index, (_, stage, _) in enumerate(PROGRESS_STAGES)}
+STAGE_MESSAGES = {stage: message for _, stage, message in PROGRESS_STAGES}
+
+StageCallback = Callable[[str], Awaitable[None]]
+
+
+def stage_reached(current: str | None, stage: str) -> bool:
+    """Whether a link at stage ``current`` has got at least as far as ``stage``."""
+    return current in STAGE_ORDER and STAGE_ORDER[current] >= STAGE_ORDER[stage]
+
 
 @dataclass
 class LlogResult:
@@ -33,6 +48,9 @@ class LlogResult:
     stdout: str
     stderr: str
     return_code: int
+    entry: dict | None = None
+    published: list[str] = field(default_factory=list)
+    skipped: list[dict] = field(default_factory=list)
 
 
 @dataclass
@@ -43,18 +61,64 @@ class ProgressEvent:
     is_error: bool = False
 
 
-@dataclass
-class ProcessingState:
-    link_id: int
-    is_running: bool = True
-    events: list = field(default_factory=list)
-    result: LlogResult | None = None
-
-
 class LlogRunner:
     def __init__(self):
+        # Serialises every step that writes to the working tree
+        # (linklog.json, blog posts, site build, git commit/push).
         self._lock = asyncio.Lock()
-        self._current_state: ProcessingState | None = None
+
+    @property
+    def repo_lock(self) -> asyncio.Lock:
+        """Lock held by whatever is mutating the repository: llog.js or the blog publisher."""
+        return self._lock
+
+    def _env(self) -> dict[str, str]:
+        """Environment for llog.js, pointing its site builds at the warm builder."""
+        env = dict(os.environ)
+        if SITE_BUILDER:
+            env["LLOG_BUILD_URL"] = SITE_BUILD_URL
+        return env
+
+    async def _run(self, cmd: list[str], on_stage: StageCallback | None = None) -> LlogResult:
+        """Run a command in the project root and collect its output.
+
+        ``on_stage`` is awaited with the name of each PROGRESS_STAGES stage
+        as llog.js reports it. If the caller is cancelled the child gets
+        SIGTERM, so llog.js can roll back whatever it had started.
+        """
+        proc = await asyncio.create_subprocess_exec(
+            *cmd,
+            cwd=str(PROJECT_ROOT),
+            env=self._env(),
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE,
+        )
+
+        async def read_stdout() -> str:
+            lines = []
+            async for line in proc.stdout:
+                decoded = line.decode()
+                lines.append(decoded)
+                event = self._parse_progress(decoded)
+                if on_stage and event and event.stage in STAGE_ORDER:
+                    await on_stage(event.stage)
+            return "".join(lines)
+
+        try:
+            stdout, stderr = await asyncio.gather(read_stdout(), proc.stderr.read())
+            await proc.wait()
+        except asyncio.CancelledError:
+            if proc.returncode is None:
+                proc.terminate()
+                await proc.wait()
+            raise
+
+        return LlogResult(
+            success=(proc.returncode == 0),
+            stdout=stdout,
+            stderr=stderr.decode(),
+            return_code=proc.returncode or 0,
+        )
 
     def _parse_progress(self, line: str) -> ProgressEvent | None:
         """Parse a line of output and return a progress event."""
@@ -91,89 +155,67 @@ class LlogRunner:
             raw_line=line,
         )
 
-    async def process_link_streaming(
-        self, link_id: int, url: str, tags: list[str]
-    ) -> AsyncIterator[ProgressEvent]:
-        """Run llog.js and yield progress events as they happen."""
-        async with self._lock:
-            self._current_state = ProcessingState(link_id=link_id)
-
-            tag_args = [f"#{tag}" for tag in tags if tag]
-            cmd = ["node", str(LLOG_SCRIPT), url] + tag_args
-
-            proc = await asyncio.create_subprocess_exec(
-                *cmd,
-                cwd=str(PROJECT_ROOT),
-                stdout=asyncio.subprocess.PIPE,
-                stderr=asyncio.subprocess.PIPE,
+    async def prepare_link(
+        self, url: str, tags: list[str], on_stage: StageCallback | None = None
+    ) -> LlogResult:
+        """Fetch, summarise and tag a link without touching the repository.
+
+        Does not take the repository lock, so several links can be prepared
+        at once. On success ``result.entry`` holds the prepared entry.
+        """
+        tag_args = [f"#{tag}" for tag in tags if tag]
+        with tempfile.TemporaryDirectory(prefix="llog-") as tmp:
+            output = Path(tmp) / "entry.json"
+            result = await self._run(
+                ["node", str(LLOG_SCRIPT), "--prepare-only", "--output", str(output), url]
+                + tag_args,
+                on_stage,
             )
-
-            stdout_lines = []
-            stderr_lines = []
-
-            async def read_stream(stream, lines_list, is_stderr=False):
-                while True:
-                    line = await stream.readline()
-                    if not line:
-                        break
-                    decoded = line.decode().rstrip()
-                    lines_list.append(decoded)
-                    event = self._parse_progress(decoded)
-                    if event:
-                        if is_stderr:
-                            event.is_error = True
-                        self._current_state.events.append(event)
-
-            await asyncio.gather(
-                read_stream(proc.stdout, stdout_lines),
-                read_stream(proc.stderr, stderr_lines, is_stderr=True),
-            )
-
-            await proc.wait()
-
-            result = LlogResult(
-                success=(proc.returncode == 0),
-                stdout="\n".join(stdout_lines),
-                stderr="\n".join(stderr_lines),
-                return_code=proc.returncode or 0,
-            )
-
-            self._current_state.result = result
-            self._current_state.is_running = False
-
-            for event in self._current_state.events:
-                yield event
-
-    async def process_link(self, url: str, tags: list[str]) -> LlogResult:
-        """Run llog.js for a single link. Sequential processing guaranteed."""
+            if result.success:
+                result.entry = json.loads(output.read_text())
+        return result
+
+    async def publish_entries(
+        self, entries: list[dict], on_stage: StageCallback | None = None
+    ) -> LlogResult:
+        """Add prepared entries to the linklog with one build, push and verify.
+
+        On success ``result.published`` lists the entry ids that went live and
+        ``result.skipped`` the entries dropped as already in the linklog.
+        """
         async with self._lock:
-            tag_args = [f"#{tag}" for tag in tags if tag]
-            cmd = ["node", str(LLOG_SCRIPT), url] + tag_args
-
-            proc = await asyncio.create_subprocess_exec(
-                *cmd,
-                cwd=str(PROJECT_ROOT),
-                stdout=asyncio.subprocess.PIPE,
-                stderr=asyncio.subprocess.PIPE,
-            )
-            stdout, stderr = await proc.communicate()
-
-            return LlogResult(
-                success=(proc.returncode == 0),
-                stdout=stdout.decode(),
-                stderr=stderr.decode(),
-                return_code=proc.returncode or 0,
+            with tempfile.TemporaryDirectory(prefix="llog-") as tmp:
+                entries_file = Path(tmp) / "entries.json"
+                report_file = Path(tmp) / "report.json"
+                entries_file.write_text(json.dumps(entries))
+                result = await self._run(
+                    [
+                        "node", str(LLOG_SCRIPT),
+                        "--publish-entries", str(entries_file),
+                        "--output", str(report_file),
+                    ],
+                    on_stage,
+                )
+                if result.success and report_file.exists():
+                    report = json.loads(report_file.read_text())
+                    result.published = report.get("published", [])
+                    result.skipped = report.get("skipped", [])
+        return result
+
+    async def verify_entries(
+        self, entries: list[dict], on_stage: StageCallback | None = None
+    ) -> LlogResult:
+        """Check that entries pushed by an earlier publish are live.
+
+        Read-only, so it does not take the repository lock.
+        """
+        with tempfile.TemporaryDirectory(prefix="llog-") as tmp:
+            entries_file = Path(tmp) / "entries.json"
+            entries_file.write_text(json.dumps(entries))
+            return await self._run(
+                ["node", str(LLOG_SCRIPT), "--verify-entries", str(entries_file)],
+                on_stage,
             )
 
-    def get_current_state(self) -> ProcessingState | None:
-        """Get the current processing state."""
-        return self._current_state
-
-    def get_events_since(self, index: int) -> list[ProgressEvent]:
-        """Get events that occurred after the given index."""
-        if not self._current_state:
-            return []
-        return self._current_state.events[index:]
-
 
 llog_runner = LlogRunner()
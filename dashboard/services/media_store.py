@@ -0,0 +1,214 @@
+"""Streaming, content-addressed storage for media uploaded to drafts."""
+
+import asyncio
+import hashlib
+import os
+import uuid
+from dataclasses import dataclass
+from pathlib import Path
+from typing import AsyncIterator, BinaryIO
+
+from .. import db
+from ..config import MEDIA_DIR, MEDIA_TMP_DIR
+from .image_optimizer import image_optimizer
+
+IMAGE_EXTENSIONS = {
+    "image/jpeg": ".jpg",
+    "image/png": ".png",
+    "image/gif": ".gif",
+    "image/webp": ".webp",
+}
+VIDEO_EXTENSIONS = {
+    "video/mp4": ".mp4",
+    "video/webm": ".webm",
+}
+MAX_IMAGE_SIZE = 10 * 1024 * 1024  # 10MB
+MAX_VIDEO_SIZE = 50 * 1024 * 1024  # 50MB
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+# Stored files are named by this many hex digits of their SHA-256
+HASH_NAME_LENGTH = 16
+STORE_WEB_PATH = "/img/media"
+# Enough leading bytes to recognise every allowed format
+SNIFF_BYTES = 64
+
+# ISO base media brands that are still images rather than video
+IMAGE_FTYP_BRANDS = {b"avif", b"avis", b"heic", b"heix", b"mif1", b"msf1"}
+
+
+class MediaRejected(ValueError):
+    """An upload is not an allowed media type."""
+
+
+class MediaTooLarge(MediaRejected):
+    """An upload is over the size limit for its type."""
+
+
+@dataclass
+class StoredMedia:
+    filename: str
+    web_path: str
+    media_type: str
+    size: int
+    content_hash: str
+    # False when the upload matched a file already in the store
+    created: bool
+
+
+def sniff_media_type(head: bytes) -> str | None:
+    """Identify an allowed media type from a file's first bytes."""
+    if head.startswith(b"\xff\xd8\xff"):
+        return "image/jpeg"
+    if head.startswith(b"\x89PNG\r\n\x1a\n"):
+        return "image/png"
+    if head[:6] in (b"GIF87a", b"GIF89a"):
+        return "image/gif"
+    if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        return "image/webp"
+    if head[4:8] == b"ftyp" and head[8:12] not in IMAGE_FTYP_BRANDS:
+        return "video/mp4"
+    if head.startswith(b"\x1a\x45\xdf\xa3") and b"webm" in head:
+        return "video/webm"
+    return None
+
+
+def max_size_for(media_type: str) -> int:
+    return MAX_IMAGE_SIZE if media_type in IMAGE_EXTENSIONS else MAX_VIDEO_SIZE
+
+
+def _write(handle: BinaryIO, digest, data: bytes):
+    digest.update(data)
+    handle.write(data)
+
+
+def _hash_file(path: Path) -> tuple[str, int]:
+    digest = hashlib.sha256()
+    with open(path, "rb") as handle:
+        while data := handle.read(UPLOAD_CHUNK_SIZE):
+            digest.update(data)
+    return digest.hexdigest(), path.stat().st_size
+
+
+def _size_error(media_type: str) -> MediaTooLarge:
+    kind = "Image" if media_type in IMAGE_EXTENSIONS else "Video"
+    limit = max_size_for(media_type) // (1024 * 1024)
+    return MediaTooLarge(f"{kind} too large. Maximum size is {limit}MB.")
+
+
+class MediaStore:
+    """Content-addressed storage for uploads, under MEDIA_DIR/media.
+
+    Data is written in UPLOAD_CHUNK_SIZE pieces to a temp file outside the
+    site and the repository, and hashed on the way, with every disk
+    operation run in a thread. The type is taken from the content itself, not the client's
+    claim, and the size limit for that type is enforced as bytes arrive.
+    Images the optimizer handles then lose their metadata, so GPS and
+    camera details never reach the store or the published site.
+
+    A complete, accepted upload is named after its SHA-256. If those bytes
+    are already stored, the existing file is used and the upload is
+    dropped, so a screenshot pasted into several drafts is kept once. Each
+    draft holds a reference on the files it uploaded or links to; files no
+    draft refers to are removed unless a published post uses them.
+    """
+
+    def __init__(self, media_dir: Path = MEDIA_DIR, tmp_dir: Path = MEDIA_TMP_DIR):
+        self.store_dir = media_dir / "media"
+        self.tmp_dir = tmp_dir
+        # Serialises adding files against removing unreferenced ones
+        self._lock = asyncio.Lock()
+
+    def path(self, filename: str) -> Path:
+        return self.store_dir / filename
+
+    async def save_upload(self, draft_id: int, chunks: AsyncIterator[bytes]) -> StoredMedia:
+        """Stream an upload into the store. Raises MediaRejected or MediaTooLarge."""
+        await asyncio.to_thread(self.store_dir.mkdir, parents=True, exist_ok=True)
+        await asyncio.to_thread(self.tmp_dir.mkdir, parents=True, exist_ok=True)
+        tmp_path = self.tmp_dir / f"{uuid.uuid4().hex}.part"
+        handle: BinaryIO = await asyncio.to_thread(open, tmp_path, "wb")
+
+        digest = hashlib.sha256()
+        media_type = None
+        limit = MAX_VIDEO_SIZE
+        size = 0
+        buffer = bytearray()
+        try:
+            async for chunk in chunks:
+                size += len(chunk)
+                if size > limit:
+                    raise _size_error(media_type or "video/mp4")
+                buffer += chunk
+                if media_type is None and len(buffer) >= SNIFF_BYTES:
+                    media_type = self._check_type(buffer)
+                    limit = max_size_for(media_type)
+                    if size > limit:
+                        raise _size_error(media_type)
+                if len(buffer) >= UPLOAD_CHUNK_SIZE:
+                    await asyncio.to_thread(_write, handle, digest, buffer)
+                    buffer = bytearray()
+
+            if media_type is None:
+                media_type = self._check_type(buffer)
+            if buffer:
+                await asyncio.to_thread(_write, handle, digest, buffer)
+            await asyncio.to_thread(handle.close)
+
+            content_hash = digest.hexdigest()
+            # Stripping is deterministic, so the same upload still dedupes
+            if await image_optimizer.strip(tmp_path, media_type):
+                content_hash, size = await asyncio.to_thread(_hash_file, tmp_path)
+            async with self._lock:
+                filename, created = await self._store(tmp_path, content_hash, media_type, size)
+                await db.add_media_ref(content_hash, draft_id)
+        except BaseException:
+            await asyncio.to_thread(handle.close)
+            await asyncio.to_thread(tmp_path.unlink, missing_ok=True)
+            raise
+
+        return StoredMedia(
+            filename=filename,
+            web_path=f"{STORE_WEB_PATH}/{filename}",
+            media_type=media_type,
+            size=size,
+            content_hash=content_hash,
+            created=created,
+        )
+
+    async def _store(
+        self, tmp_path: Path, content_hash: str, media_type: str, size: int
+    ) -> tuple[str, bool]:
+        """Move a finished upload into place unless its content is already stored."""
+        existing = await db.get_media_file(content_hash)
+        if existing and await asyncio.to_thread(self.path(existing["filename"]).exists):
+            await asyncio.to_thread(tmp_path.unlink)
+            return existing["filename"], False
+
+        # A known hash whose file went missing is restored under its old name
+        if existing:
+            filename = existing["filename"]
+        else:
+            extension = IMAGE_EXTENSIONS.get(media_type) or VIDEO_EXTENSIONS[media_type]
+            filename = f"{content_hash[:HASH_NAME_LENGTH]}{extension}"
+        await asyncio.to_thread(os.replace, tmp_path, self.path(filename))
+        await db.add_media_file(content_hash, filename, media_type, size)
+        return filename, True
+
+    async def remove_unreferenced(self) -> int:
+        """Delete stored files, and their variants, that are no longer needed."""
+        async with self._lock:
+            filenames = await db.delete_unreferenced_media()
+            for filename in filenames:
+                await asyncio.to_thread(self.path(filename).unlink, missing_ok=True)
+        return len(filenames)
+
+    @staticmethod
+    def _check_type(head: bytes) -> str:
+        media_type = sniff_media_type(bytes(head[:SNIFF_BYTES]))
+        if media_type is None:
+            raise MediaRejected(
+                "Invalid file type. Allowed: images (jpg, png, gif, webp) and videos (mp4, webm)"
+            )
+        return media_type
+
+
+media_store = MediaStore()
@@ -0,0 +1,217 @@
+"""Incremental site builds through a persistent Eleventy process."""
+
+import asyncio
+import json
+import logging
+import os
+from pathlib import Path
+
+from ..config import (
+    PROJECT_ROOT,
+    SITE_BUILD_TIMEOUT,
+    SITE_BUILDER,
+    SITE_BUILDER_HEARTBEAT,
+    SITE_BUILDER_SCRIPT,
+    SITE_BUILDER_STALL_TIMEOUT,
+)
+
+logger = logging.getLogger(__name__)
+
+FULL_BUILD_COMMAND = ["npm", "run", "build:ci"]
+# The Tailwind steps of build:ci. Tailwind scans templates and posts for the
+# classes they use, so the CSS is regenerated with every incremental build.
+CSS_BUILD_COMMAND = ["npx", "run-s", "css:*"]
+
+
+class SiteBuildError(RuntimeError):
+    """The site failed to build."""
+
+
+class SiteBuilder:
+    """Keeps eleventy-builder.mjs running and sends it changed files.
+
+    The builder loads Eleventy once, does a full build to warm up and then
+    rebuilds incrementally, so a new post or linklog entry only re-renders
+    the pages that depend on it. Tailwind runs alongside each incremental
+    build, so a post using new utility classes gets them; only the icons,
+    generated from the logo, are left to the deploy's full build.
+
+    The builder answers a failed or overlong build at once, and signals
+    that it is alive while it works, so only a builder that has gone quiet
+    for ``stall_timeout`` is waited out; it is then restarted. Whenever the
+    warm builder is unavailable, stalls or reports a failure, ``rebuild``
+    falls back to a full build, whose output then explains any error.
+    """
+
+    def __init__(
+        self,
+        script: Path = SITE_BUILDER_SCRIPT,
+        enabled: bool = SITE_BUILDER,
+        timeout: float = SITE_BUILD_TIMEOUT,
+        heartbeat: float = SITE_BUILDER_HEARTBEAT,
+        stall_timeout: float = SITE_BUILDER_STALL_TIMEOUT,
+    ):
+        self.script = script
+        self.enabled = enabled
+        self.timeout = timeout
+        self.heartbeat = heartbeat
+        self.stall_timeout = stall_timeout
+        self._proc: asyncio.subprocess.Process | None = None
+        self._tasks: list[asyncio.Task] = []
+        self._replies: dict[int, asyncio.Future] = {}
+        self._next_id = 1
+        self._last_heard = 0.0
+        # One build at a time, whoever asks for it
+        self._lock = asyncio.Lock()
+
+    @property
+    def running(self) -> bool:
+        return self._proc is not None and self._proc.returncode is None
+
+    async def start(self):
+        """Launch the builder; it warms up with a full build in the background."""
+        if not self.enabled or self.running:
+            return
+        try:
+            self._proc = await asyncio.create_subprocess_exec(
+                "node", str(self.script),
+                cwd=str(PROJECT_ROOT),
+                env={
+                    **os.environ,
+                    "ELEVENTY_BUILDER_TIMEOUT": str(self.timeout),
+                    "ELEVENTY_BUILDER_HEARTBEAT": str(self.heartbeat),
+                },
+                stdin=asyncio.subprocess.PIPE,
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.PIPE,
+            )
+        except OSError as e:
+            logger.warning("Could not start the site builder: %s", e)
+            self._proc = None
+            return
+        self._tasks = [
+            asyncio.create_task(self._read_replies(self._proc), name="site-builder-replies"),
+            asyncio.create_task(self._read_log(self._proc), name="site-builder-log"),
+        ]
+
+    async def stop(self):
+        """Stop the builder and wait for it to exit."""
+        proc, self._proc = self._proc, None
+        if proc is not None and proc.returncode is None:
+            proc.stdin.close()
+            try:
+                await asyncio.wait_for(proc.wait(), 5)
+            except asyncio.TimeoutError:
+                proc.terminate()
+                await proc.wait()
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def _read_replies(self, proc: asyncio.subprocess.Process):
+        async for line in proc.stdout:
+            self._last_heard = asyncio.get_running_loop().time()
+            try:
+                message = json.loads(line)
+            except ValueError:
+                continue
+            if message.get("event") == "ready":
+                logger.info("Site builder ready")
+            elif message.get("event") == "failed":
+                logger.warning("Site builder warm-up failed: %s", message.get("error"))
+            elif (reply := self._replies.pop(message.get("id"), None)) and not reply.done():
+                reply.set_result(message)
+
+        if proc is self._proc:
+            logger.warning("Site builder exited with code %s", await proc.wait())
+        for reply in self._replies.values():
+            if not reply.done():
+                reply.set_exception(SiteBuildError("Site builder exited"))
+        self._replies.clear()
+
+    async def _read_log(self, proc: asyncio.subprocess.Process):
+        async for line in proc.stderr:
+            logger.debug("eleventy: %s", line.decode().rstrip())
+
+    async def rebuild(self, changed: list[Path]):
+        """Rebuild the site after changed files, incrementally when possible.
+
+        Raises SiteBuildError if the full build fails too.
+        """
+        async with self._lock:
+            incremental = asyncio.create_task(self._incremental(changed))
+            try:
+                await self._run(CSS_BUILD_COMMAND)
+            finally:
+                built = await incremental
+            if not built:
+                await self.full_build()
+
+    async def _incremental(self, changed: list[Path]) -> bool:
+        await self.start()
+        if not self.running:
+            return False
+
+        request_id = self._next_id
+        self._next_id += 1
+        reply = asyncio.get_running_loop().create_future()
+        self._replies[request_id] = reply
+        try:
+            # The builder holds requests until its warm-up build is done
+            request = {"id": request_id, "changed": [str(path) for path in changed]}
+            self._proc.stdin.write(json.dumps(request).encode() + b"\n")
+            await self._proc.stdin.drain()
+            result = await self._wait_for_reply(reply)
+        except asyncio.TimeoutError:
+            logger.warning("Site builder stopped responding, restarting it for a full build")
+            reply.cancel()
+            self._proc.kill()
+            await self.stop()
+            return False
+        except (ConnectionError, SiteBuildError) as e:
+            logger.warning("Incremental build failed, running a full build: %s", e)
+            return False
+        finally:
+            self._replies.pop(request_id, None)
+
+        if not result.get("ok"):
+            logger.warning("Incremental build failed, running a full build: %s", result.get("error"))
+            return False
+        logger.info("Rebuilt %d page(s) in %d ms", result.get("written", 0), result.get("ms", 0))
+        return True
+
+    async def _wait_for_reply(self, reply: asyncio.Future) -> dict:
+        """Wait for a reply for as long as the builder keeps showing signs of life."""
+        loop = asyncio.get_running_loop()
+        self._last_heard = loop.time()
+        while True:
+            remaining = self._last_heard + self.stall_timeout - loop.time()
+            if remaining <= 0:
+                raise asyncio.TimeoutError
+            try:
+                return await asyncio.wait_for(asyncio.shield(reply), remaining)
+            except asyncio.TimeoutError:
+                continue
+
+    async def full_build(self):
+        """Build the whole site from scratch."""
+        await self._run(FULL_BUILD_COMMAND)
+
+    async def _run(self, cmd: list[str]):
+        proc = await asyncio.create_subprocess_exec(
+            *cmd,
+            cwd=str(PROJECT_ROOT),
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE,
+        )
+        stdout, stderr = await proc.communicate()
+        if proc.returncode != 0:
+            raise SiteBuildError(
+                f"Command failed: {' '.join(cmd)}\n"
+                f"stdout: {stdout.decode()}\n"
+                f"stderr: {stderr.decode()}"
+            )
+
+
+site_builder = SiteBuilder()
@@ -14,6 +14,13 @@ let saveTimeout = null;
 let isDirty = false;
 let easyMDE = null;
 let currentAnalysis = null;
+let draftVersion = parseInt(titleInput.dataset.version);
+let lastSaved = null;
+// Set when the server copy moved on under this editor; autosave stays off
+// until the user chooses to reload or overwrite it
+let hasConflict = false;
+
+class DraftConflictError extends Error {}
 
 function initEditor() {
     try {
@@ -111,40 +118,145 @@ function markClean() {
     saveBtn.textContent = 'Save';
 }
 
-async function saveDraft() {
+function currentFields() {
+    return {
+        title: titleInput.value,
+        description: descriptionInput.value,
+        tags: tagsInput.value,
+        content: getEditorContent(),
+        audience_notes: audienceNotesInput.value
+    };
+}
+
+// Smallest single splice turning oldText into newText. Offsets are
+// JavaScript string indexes (UTF-16 code units), which the server expects.
+function computeEdit(oldText, newText) {
+    const minLength = Math.min(oldText.length, newText.length);
+    let start = 0;
+    while (start < minLength && oldText[start] === newText[start]) start++;
+
+    let oldEnd = oldText.length;
+    let newEnd = newText.length;
+    while (oldEnd > start && newEnd > start && oldText[oldEnd - 1] === newText[newEnd - 1]) {
+        oldEnd--;
+        newEnd--;
+    }
+    return { start, end: oldEnd, text: newText.slice(start, newEnd) };
+}
+
+// Send only what changed since the last save. Returns false when the edits
+// do not fit the server copy, so the caller can do a full save, and throws
+// DraftConflictError when the draft was changed elsewhere.
+async function patchDraft(fields) {
+    const body = { version: draftVersion, edits: [], length: fields.content.length };
+    if (fields.content !== lastSaved.content) {
+        body.edits.push(computeEdit(lastSaved.content, fields.content));
+    }
+    for (const name of ['title', 'description', 'tags', 'audience_notes']) {
+        if (fields[name] !== lastSaved[name]) body[name] = fields[name];
+    }
+
+    const response = await fetch(`/api/drafts/${draftId}`, {
+        method: 'PATCH',
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify(body)
+    });
+
+    if (response.status === 409) throw new DraftConflictError();
+    if (response.status === 422) return false;
+    if (!response.ok) {
+        const error = await response.json();
+        throw new Error(error.detail || 'Unknown error');
+    }
+    draftVersion = (await response.json()).version;
+    return true;
+}
+
+// Send the file as the raw request body so the server can stream it to
+// disk and reject it as soon as it passes the size limit
+function uploadMedia(file) {
+    return fetch(`/api/drafts/${draftId}/media`, {
+        method: 'POST',
+        headers: { 'Content-Type': file.type || 'application/octet-stream' },
+        body: file
+    });
+}
+
+async function putDraft(fields) {
+    const formData = new FormData();
+    for (const [name, value] of Object.entries(fields)) {
+        formData.append(name, value);
+    }
+
+    const response = await fetch(`/api/drafts/${draftId}`, {
+        method: 'PUT',
+        body: formData
+    });
+
+    if (!response.ok) {
+        const error = await response.json();
+        throw new Error(error.detail || 'Unknown error');
+    }
+    const { draft } = await response.json();
+    draftVersion = draft.version;
+    return draft;
+}
+
+// Tell the user the draft changed elsewhere and let them pick which copy wins
+function handleConflict() {
+    hasConflict = true;
+    saveBtn.textContent = 'Save (overwrite)';
+    const reload = confirm(
+        'This draft was changed somewhere else, in another tab or by restoring a revision.\n\n' +
+        'OK loads the saved version and discards your unsaved changes. ' +
+        'Cancel keeps your text; autosave stays off until you press Save, ' +
+        'which overwrites the saved version.'
+    );
+    if (reload) {
+        isDirty = false;
+        location.reload();
+    }
+}
+
+// overwrite replaces the server copy even after a conflict
+async function saveDraft(overwrite = false) {
+    if (hasConflict && !overwrite) return;
+
     saveBtn.textContent = 'Saving...';
     saveBtn.disabled = true;
 
-    const formData = new FormData();
-    formData.append('title', titleInput.value);
-    formData.append('description', descriptionInput.value);
-    formData.append('tags', tagsInput.value);
-    formData.append('content', getEditorContent());
-    formData.append('audience_notes', audienceNotesInput.value);
+    const fields = currentFields();
 
     try {
-        const response = await fetch(`/api/drafts/${draftId}`, {
-            method: 'PUT',
-            body: formData
-        });
-
-        if (response.ok) {
-            markClean();
-        } else {
-            const error = await response.json();
-            alert('Save failed: ' + (error.detail || 'Unknown error'));
+        if (!lastSaved || overwrite || !(await patchDraft(fields))) {
+            // The form post turns line breaks into CRLF and the server
+            // stores them as LF, so diff later edits against what it kept
+            const draft = await putDraft(fields);
+            fields.content = draft.content;
         }
+        lastSaved = fields;
+        hasConflict = false;
+        markClean();
     } catch (e) {
-        alert('Save failed: ' + e.message);
+        if (e instanceof DraftConflictError) {
+            handleConflict();
+        } else {
+            alert('Save failed: ' + e.message);
+        }
     } finally {
         saveBtn.disabled = false;
         if (!isDirty) saveBtn.textContent = 'Save';
+        else if (hasConflict) saveBtn.textContent = 'Save (overwrite)';
     }
 }
 
 function autoSave() {
     if (saveTimeout) clearTimeout(saveTimeout);
     markDirty();
+    if (hasConflict) {
+        saveBtn.textContent = 'Save (overwrite)';
+        return;
+    }
     saveTimeout = setTimeout(saveDraft, 2000);
 }
 
@@ -154,38 +266,79 @@ function autoSave() {
 
 saveBtn.addEventListener('click', () => {
     if (saveTimeout) clearTimeout(saveTimeout);
-    saveDraft();
+    saveDraft(hasConflict);
 });
 
+function finishAnalysis() {
+    analyzeBtn.textContent = 'Analyze';
+    analyzeBtn.disabled = false;
+}
+
+function showAnalysisError(message) {
+    analysisContent.innerHTML = `<p class="empty-state" style="color: var(--danger)">Analysis failed: ${escapeHtml(message)}</p>`;
+}
+
+function renderUsage(usage) {
+    if (!usage || usage.requests === 0) return;
+    const note = document.createElement('p');
+    note.className = 'analysis-usage';
+    note.textContent = `${usage.requests} request(s): ${usage.input_tokens} input tokens, ` +
+        `${usage.cache_read_input_tokens} read from cache, ` +
+        `${usage.cache_creation_input_tokens} written to cache, ${usage.output_tokens} output`;
+    analysisContent.prepend(note);
+}
+
 analyzeBtn.addEventListener('click', async () => {
     if (isDirty) {
         await saveDraft();
     }
+    if (hasConflict) return;
+
+    if (!getEditorContent().trim()) {
+        showAnalysisError('Draft has no content to analyze');
+        return;
+    }
 
     analyzeBtn.textContent = 'Analyzing...';
     analyzeBtn.disabled = true;
     analysisContent.innerHTML = '<p class="empty-state">Analyzing your paragraphs with AI...</p>';
 
-    try {
-        const response = await fetch('/api/ai/analyze', {
-            method: 'POST',
-            headers: { 'Content-Type': 'application/json' },
-            body: JSON.stringify({ draft_id: parseInt(draftId) })
-        });
-
-        if (response.ok) {
-            const data = await response.json();
+    const partial = [];
+    const eventSource = new EventSource(`/api/ai/analyze/stream?draft_id=${draftId}&incremental=true`);
+
+    eventSource.onmessage = function(event) {
+        const data = JSON.parse(event.data);
+
+        if (data.type === 'start') {
+            analyzeBtn.textContent = `Analyzing 0/${data.total}...`;
+        } else if (data.type === 'paragraph') {
+            partial.push(data.analysis);
+            partial.sort((a, b) => a.paragraph_index - b.paragraph_index);
+            renderAnalysis(partial);
+            analyzeBtn.textContent = `Analyzing ${data.done}/${data.total}...`;
+        } else if (data.type === 'complete') {
+            eventSource.close();
             renderAnalysis(data.analysis);
-        } else {
-            const error = await response.json();
-            analysisContent.innerHTML = `<p class="empty-state" style="color: var(--danger)">Analysis failed: ${error.detail || 'Unknown error'}</p>`;
+            renderUsage(data.usage);
+            finishAnalysis();
+        } else if (data.type === 'error') {
+            eventSource.close();
+            if (partial.length === 0) {
+                showAnalysisError(data.message);
+            } else {
+                alert('Analysis stopped early: ' + data.message + '\n\nResults so far have been saved.');
+            }
+            finishAnalysis();
         }
-    } catch (e) {
-        analysisContent.innerHTML = `<p class="empty-state" style="color: var(--danger)">Analysis failed: ${e.message}</p>`;
-    } finally {
-        analyzeBtn.textContent = 'Analyze';
-        analyzeBtn.disabled = false;
-    }
+    };
+
+    eventSource.onerror = function() {
+        eventSource.close();
+        if (partial.length === 0) {
+            showAnalysisError('Connection lost');
+        }
+        finishAnalysis();
+    };
 });
 
 function renderAnalysis(analysis) {
@@ -323,6 +476,7 @@ publishBtn.addEventListener('click', async () => {
     if (isDirty) {
         await saveDraft();
     }
+    if (hasConflict) return;
 
     if (!titleInput.value.trim()) {
         alert('Please add a title before publishing.');
@@ -336,10 +490,60 @@ publishBtn.addEventListener('click', async () => {
     showPublishModal();
 });
 
+let publishSource = null;
+
+function resetPublishButton() {
+    confirmPublishBtn.textContent = 'Publish';
+    confirmPublishBtn.disabled = false;
+}
+
+// Follow a publish job. The request only queues it, so the page can be
+// reloaded mid-publish and pick the job up again.
+function followPublishJob(jobId) {
+    if (publishSource) publishSource.close();
+
+    confirmPublishBtn.textContent = 'Publishing...';
+    confirmPublishBtn.disabled = true;
+    publishStatus.innerHTML = '<p>Queued...</p>';
+
+    const eventSource = new EventSource('/api/jobs/' + jobId + '/events');
+    publishSource = eventSource;
+
+    eventSource.onmessage = function(event) {
+        const data = JSON.parse(event.data);
+
+        if (data.type === 'progress') {
+            publishStatus.innerHTML = '<p></p>';
+            publishStatus.firstChild.textContent = data.message;
+        } else if (data.type === 'complete') {
+            eventSource.close();
+            publishSource = null;
+            if (data.success) {
+                publishStatus.innerHTML = '<p style="color: var(--success)"></p>';
+                publishStatus.firstChild.textContent = `Published successfully to ${data.path}`;
+                setTimeout(() => {
+                    window.location.href = '/drafts';
+                }, 2000);
+            } else {
+                resetPublishButton();
+                publishStatus.innerHTML = '<p style="color: var(--danger)"></p>';
+                publishStatus.firstChild.textContent = `Publish failed: ${data.error || 'Unknown error'}`;
+            }
+        }
+    };
+
+    eventSource.onerror = function() {
+        // EventSource retries by itself; only give up once it has
+        if (eventSource.readyState === EventSource.CLOSED) {
+            resetPublishButton();
+        }
+    };
+}
+
 confirmPublishBtn.addEventListener('click', async () => {
     confirmPublishBtn.textContent = 'Publishing...';
     confirmPublishBtn.disabled = true;
-    publishStatus.innerHTML = '<p>Creating file, building site, committing...</p>';
+    publishStatus.innerHTML = '<p>Queueing...</p>';
 
     try {
         const response = await fetch(`/api/drafts/${draftId}/publish`, {
@@ -347,23 +551,29 @@ confirmPublishBtn.addEventListener('click', async () => {
         });
 
         if (response.ok) {
-            const data = await response.json();
-            publishStatus.innerHTML = `<p style="color: var(--success)">Published successfully to ${data.path}</p>`;
-            setTimeout(() => {
-                window.location.href = '/drafts';
-            }, 2000);
+            const job = await response.json();
+            followPublishJob(job.job_id);
         } else {
             const error = await response.json();
             publishStatus.innerHTML = `<p style="color: var(--danger)">Publish failed: ${error.detail || 'Unknown error'}</p>`;
+            resetPublishButton();
         }
     } catch (e) {
         publishStatus.innerHTML = `<p style="color: var(--danger)">Publish failed: ${e.message}</p>`;
-    } finally {
-        confirmPublishBtn.textContent = 'Publish';
-        confirmPublishBtn.disabled = false;
+        resetPublishButton();
     }
 });
 
+// Reattach to a publish that is still running from an earlier visit
+fetch(`/api/drafts/${draftId}/publish`)
+    .then(r => r.json())
+    .then(publish => {
+        if (publish.running) {
+            showPublishModal();
+            followPublishJob(publish.job_id);
+        }
+    });
+
 const imageModal = document.getElementById('image-modal');
 const videoModal = document.getElementById('video-modal');
 const toolbarImage = document.getElementById('toolbar-image');
@@ -499,14 +709,8 @@ document.getElementById('insert-image-btn').addEventListener('click', async () =
 
     if (activeTab === 'upload' && pendingImageFile) {
         statusEl.innerHTML = '<p>Uploading...</p>';
-        const formData = new FormData();
-        formData.append('file', pendingImageFile);
-
         try {
-            const response = await fetch(`/api/drafts/${draftId}/media`, {
-                method: 'POST',
-                body: formData
-            });
+            const response = await uploadMedia(pendingImageFile);
 
             if (response.ok) {
                 const data = await response.json();
@@ -620,14 +824,8 @@ document.getElementById('insert-video-btn').addEventListener('click', async () =
         }
     } else if (activeTab === 'upload' && pendingVideoFile) {
         statusEl.innerHTML = '<p>Uploading...</p>';
-        const formData = new FormData();
-        formData.append('file', pendingVideoFile);
-
         try {
-            const response = await fetch(`/api/drafts/${draftId}/media`, {
-                method: 'POST',
-                body: formData
-            });
+            const response = await uploadMedia(pendingVideoFile);
 
             if (response.ok) {
                 const data = await response.json();
@@ -658,3 +856,4 @@ window.hideImageModal = hideImageModal;
 window.hideVideoModal = hideVideoModal;
 
 initEditor();
+lastSaved = currentFields();
@@ -0,0 +1,191 @@
+#!/usr/bin/env node
+
+// Persistent, incremental Eleventy build for the dashboard.
+//
+// Keeps Eleventy loaded in watch mode with incremental builds, so a change
+// only rebuilds the templates that depend on it. Requests arrive on stdin,
+// one JSON object per line:
+//
+//   {"id": 1, "changed": ["src/blog/2026-01-01-post.md"]}
+//
+// The listed files are touched so the watcher picks them up even if it
+// missed the write, and once a build started after the request has
+// covered all of them the reply goes to stdout:
+//
+//   {"id": 1, "ok": true, "written": 12, "ms": 840}
+//
+// A build that fails, or does not finish within ELEVENTY_BUILDER_TIMEOUT
+// seconds, is answered straight away with
+//
+//   {"id": 1, "ok": false, "error": "..."}
+//
+// {"event": "ready"} is printed after the initial full build; if that
+// build fails, {"event": "failed"} is printed and the builder exits. While
+// requests are outstanding, {"event": "alive"} is printed every
+// ELEVENTY_BUILDER_HEARTBEAT seconds, so the dashboard can tell a long
+// build from a builder that stopped responding. Everything Eleventy itself
+// prints goes to stderr, so stdout only carries these messages.
+
+import fs from "node:fs/promises";
+import path from "node:path";
+import readline from "node:readline";
+import { fileURLToPath } from "node:url";
+
+import Eleventy from "@11ty/eleventy";
+
+const ROOT = path.dirname(fileURLToPath(import.meta.url));
+const BUILD_TIMEOUT_MS = parseFloat(process.env.ELEVENTY_BUILDER_TIMEOUT || "120") * 1000;
+const HEARTBEAT_MS = parseFloat(process.env.ELEVENTY_BUILDER_HEARTBEAT || "5") * 1000;
+
+const send = (message) => process.stdout.write(JSON.stringify(message) + "\n");
+console.log = console.error;
+console.info = console.error;
+
+let ready = false;
+let currentBuild = null;
+let buildsFinished = 0;
+const waiting = [];
+const requests = new Map();
+
+function finishRequest(id, reply) {
+    const request = requests.get(id);
+    if (!request) return;
+    clearTimeout(request.timer);
+    requests.delete(id);
+    send({ id, ...reply });
+}
+
+function buildStarted(changedFiles) {
+    currentBuild = {
+        started: Date.now(),
+        changed: new Set(changedFiles.map((file) => path.resolve(ROOT, file))),
+    };
+}
+
+function buildFinished(results) {
+    const build = currentBuild;
+    currentBuild = null;
+    buildsFinished += 1;
+    const written = Array.isArray(results) ? results.length : 0;
+
+    if (!ready) {
+        ready = true;
+        send({ event: "ready", written });
+        for (const request of waiting.splice(0)) {
+            touch(request);
+        }
+        return;
+    }
+    if (!build) return;
+
+    for (const [id, request] of requests) {
+        if (request.received > build.started) continue;
+        for (const file of build.changed) {
+            request.pending.delete(file);
+        }
+        if (request.pending.size === 0) {
+            finishRequest(id, { ok: true, written, ms: Date.now() - request.received });
+        }
+    }
+}
+
+function buildFailed(error) {
+    const build = currentBuild;
+    currentBuild = null;
+    const message = error?.message || String(error);
+
+    if (!ready) {
+        // Without a complete first build there is nothing to update
+        // incrementally; the dashboard falls back to full builds
+        for (const request of waiting.splice(0)) {
+            finishRequest(request.id, { ok: false, error: message });
+        }
+        send({ event: "failed", error: message });
+        process.exit(1);
+    }
+    if (!build) return;
+
+    for (const [id, request] of requests) {
+        if (request.received > build.started) continue;
+        finishRequest(id, { ok: false, error: message });
+    }
+}
+
+async function touch(request) {
+    const now = new Date();
+    for (const file of [...request.pending]) {
+        try {
+            await fs.utimes(file, now, now);
+        } catch {
+            // Deleted files are picked up by the watcher on their own
+            request.pending.delete(file);
+        }
+    }
+    if (request.pending.size === 0) {
+        finishRequest(request.id, { ok: true, written: 0, ms: 0 });
+    }
+}
+
+function handle(line) {
+    let message;
+    try {
+        message = JSON.parse(line);
+    } catch {
+        return;
+    }
+    const { id, changed = [] } = message;
+    const request = {
+        id,
+        received: Date.now(),
+        pending: new Set(changed.map((file) => path.resolve(ROOT, file))),
+        timer: setTimeout(
+            () => finishRequest(id, { ok: false, error: "Timed out waiting for the build" }),
+            BUILD_TIMEOUT_MS,
+        ),
+    };
+    requests.set(id, request);
+
+    if (ready) {
+        touch(request);
+    } else {
+        waiting.push(request);
+    }
+}
+
+const elev = new Eleventy(undefined, undefined, {
+    configPath: path.join(ROOT, "eleventy.config.mjs"),
+    config(eleventyConfig) {
+        eleventyConfig.on("eleventy.beforeWatch", buildStarted);
+        eleventyConfig.on("eleventy.after", ({ results }) => buildFinished(results));
+    },
+});
+elev.setIncrementalBuild(true);
+
+// A failed build never reaches eleventy.after: depending on how Eleventy
+// was started it either throws from executeBuild or only logs the error
+const executeBuild = elev.executeBuild.bind(elev);
+elev.executeBuild = async (...args) => {
+    const finishedBefore = buildsFinished;
+    let result;
+    try {
+        result = await executeBuild(...args);
+    } catch (error) {
+        buildFailed(error);
+        throw error;
+    }
+    if (buildsFinished === finishedBefore) {
+        buildFailed(new Error("The build failed; see the builder log"));
+    }
+    return result;
+};
+
+setInterval(() => {
+    if (requests.size > 0) send({ event: "alive" });
+}, HEARTBEAT_MS).unref();
+
+readline.createInterface({ input: process.stdin }).on("line", handle).on("close", () => {
+    process.exit(0);
+});
+
+await elev.init();
+await elev.watch();
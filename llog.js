@@ -4,7 +4,7 @@ const { program } = require('commander');
 const fs = require('fs').promises;
 const path = require('path');
 const os = require('os');
-const { execSync } = require('child_process');
+const { execSync, execFileSync } = require('child_process');
 const crypto = require('crypto');
 const https = require('https');
 const http = require('http');
@@ -13,6 +13,129 @@ const LOCKFILE = path.join(__dirname, '.llog.lock');
 const LINKLOG_DATA_FILE = path.join(__dirname, 'src/_11ty/_data/linklog.json');
 const CONFIG_FILE = path.join(os.homedir(), 'llog.conf');
 const BACKUP_SUFFIX = '.backup';
+// Kept outside the repository: publishing runs `git add .`
+const CACHE_DIR = process.env.LLOG_CACHE_DIR
+    || path.join(process.env.XDG_CACHE_HOME || path.join(os.homedir(), '.cache'), 'llog');
+const CACHE_MAX_BYTES = parseInt(process.env.LLOG_CACHE_MAX_BYTES || `${200 * 1024 * 1024}`, 10);
+// Pages fetched this recently are reused without asking the server again
+const CACHE_FRESH_MS = parseInt(process.env.LLOG_CACHE_FRESH_SECONDS || '86400', 10) * 1000;
+
+// On-disk cache for fetched pages and Claude responses. Bodies are stored
+// once under their SHA-256 in objects/; each key has a small JSON record in
+// entries/ pointing at its body along with any metadata. Records are
+// touched on every hit, and the least recently used are evicted once the
+// cache grows past maxBytes. Everything is written to a temp file and
+// renamed, so concurrent --prepare-only runs can share the cache.
+class FetchCache {
+    constructor(dir = CACHE_DIR, maxBytes = CACHE_MAX_BYTES) {
+        this.dir = dir;
+        this.maxBytes = maxBytes;
+    }
+
+    hash(value) {
+        return crypto.createHash('sha256').update(value).digest('hex');
+    }
+
+    entryPath(key) {
+        return path.join(this.dir, 'entries', `${this.hash(key)}.json`);
+    }
+
+    objectPath(digest) {
+        return path.join(this.dir, 'objects', digest.slice(0, 2), digest);
+    }
+
+    async writeAtomic(file, data) {
+        await fs.mkdir(path.dirname(file), { recursive: true });
+        const tmpFile = `${file}.${process.pid}.${crypto.randomBytes(4).toString('hex')}.tmp`;
+        await fs.writeFile(tmpFile, data);
+        await fs.rename(tmpFile, file);
+    }
+
+    // Returns { meta, body } for key, or null. body is a string.
+    async get(key) {
+        const file = this.entryPath(key);
+        try {
+            const record = JSON.parse(await fs.readFile(file, 'utf8'));
+            if (record.key !== key) {
+                return null;
+            }
+            const body = await fs.readFile(this.objectPath(record.digest), 'utf8');
+            const now = new Date();
+            await fs.utimes(file, now, now).catch(() => {});
+            return { meta: record.meta, body };
+        } catch (error) {
+            return null;
+        }
+    }
+
+    async touch(key) {
+        const now = new Date();
+        await fs.utimes(this.entryPath(key), now, now).catch(() => {});
+    }
+
+    async put(key, body, meta = {}) {
+        try {
+            const digest = this.hash(body);
+            const objectFile = this.objectPath(digest);
+            try {
+                await fs.access(objectFile);
+            } catch {
+                await this.writeAtomic(objectFile, body);
+            }
+            await this.writeAtomic(this.entryPath(key), JSON.stringify({ key, digest, meta }));
+            await this.evict();
+        } catch (error) {
+            console.warn(`⚠️ Could not write cache entry: ${error.message}`);
+        }
+    }
+
+    // Drop least recently used entries, and bodies no entry refers to,
+    // until the cache fits in maxBytes
+    async evict() {
+        const entriesDir = path.join(this.dir, 'entries');
+        const entries = [];
+        const objectSizes = new Map();
+        const refs = new Map();
+        let total = 0;
+
+        for (const name of await fs.readdir(entriesDir).catch(() => [])) {
+            if (!name.endsWith('.json')) continue;
+            const file = path.join(entriesDir, name);
+            try {
+                const [stat, record] = await Promise.all([
+                    fs.stat(file),
+                    fs.readFile(file, 'utf8').then(JSON.parse)
+                ]);
+                if (!objectSizes.has(record.digest)) {
+                    const objectStat = await fs.stat(this.objectPath(record.digest));
+                    objectSizes.set(record.digest, objectStat.size);
+                    total += objectStat.size;
+                }
+                refs.set(record.digest, (refs.get(record.digest) || 0) + 1);
+                entries.push({ file, digest: record.digest, size: stat.size, usedAt: stat.mtimeMs });
+                total += stat.size;
+            } catch {
+                // Half-written or already evicted by another process
+            }
+        }
+        if (total <= this.maxBytes) {
+            return;
+        }
+
+        entries.sort((a, b) => a.usedAt - b.usedAt);
+        for (const entry of entries) {
+            if (total <= this.maxBytes) break;
+            await fs.unlink(entry.file).catch(() => {});
+            total -= entry.size;
+            const remaining = refs.get(entry.digest) - 1;
+            refs.set(entry.digest, remaining);
+            if (remaining === 0) {
+                await fs.unlink(this.objectPath(entry.digest)).catch(() => {});
+                total -= objectSizes.get(entry.digest);
+            }
+        }
+    }
+}
 
 class LinkLogCLI {
     constructor() {
@@ -21,6 +144,7 @@ class LinkLogCLI {
         this.gitStashApplied = false;
         this.initialCommitHash = null;
         this.pushCompleted = false;
+        this.cache = new FetchCache();
     }
 
     async acquireLock() {
@@ -244,21 +368,87 @@ class LinkLogCLI {
         }
     }
 
+    // Serialise once and swap the file into place, so readers (Eleventy,
+    // the dashboard) never see a partially written linklog
     async saveLinkLogData(data) {
-        await fs.writeFile(LINKLOG_DATA_FILE, JSON.stringify(data, null, 2));
+        const tmpFile = `${LINKLOG_DATA_FILE}.${process.pid}.tmp`;
+        const handle = await fs.open(tmpFile, 'w');
+        try {
+            await handle.writeFile(JSON.stringify(data, null, 2));
+            await handle.sync();
+        } finally {
+            await handle.close();
+        }
+        await fs.rename(tmpFile, LINKLOG_DATA_FILE);
+    }
+
+    // Same normalisation as the dashboard's canonical URLs: scheme and host
+    // lower-cased, http treated as https, default port, fragment, trailing
+    // slash and utm_* parameters dropped
+    normalizeUrl(url) {
+        let parsed;
+        try {
+            parsed = new URL(url.trim());
+        } catch {
+            return url.trim();
+        }
+        const protocol = parsed.protocol === 'http:' ? 'https:' : parsed.protocol;
+        const pathname = parsed.pathname.replace(/\/+$/, '');
+        let search = parsed.search;
+        const params = [...parsed.searchParams];
+        const kept = params.filter(([key]) => !key.toLowerCase().startsWith('utm_'));
+        if (kept.length !== params.length) {
+            const query = new URLSearchParams(kept).toString();
+            search = query ? `?${query}` : '';
+        }
+        return `${protocol}//${parsed.host}${pathname}${search}`;
+    }
+
+    indexByUrl(entries) {
+        return new Map(entries.map(entry => [this.normalizeUrl(entry.url), entry]));
     }
 
     generateEntryId() {
         return crypto.randomBytes(8).toString('hex');
     }
 
-    async fetchPageContent(url, redirectCount = 0) {
-        const maxRedirects = 5;
+    // Fetch and extract a page, going through the cache. Fresh cache
+    // entries are used as they are; stale ones are revalidated with their
+    // ETag / Last-Modified so an unchanged page is not downloaded again.
+    async fetchPageContent(url) {
+        console.log(`🔍 Fetching page content from ${url}...`);
+
+        const key = `page:${this.normalizeUrl(url)}`;
+        const cached = await this.cache.get(key);
+        if (cached && Date.now() - cached.meta.fetchedAt < CACHE_FRESH_MS) {
+            console.log('📦 Using cached page content');
+            return this.extractContentFromHtml(cached.body, new URL(url).hostname);
+        }
+
+        const validators = {};
+        if (cached?.meta.etag) validators['If-None-Match'] = cached.meta.etag;
+        if (cached?.meta.lastModified) validators['If-Modified-Since'] = cached.meta.lastModified;
 
-        if (redirectCount === 0) {
-            console.log(`🔍 Fetching page content from ${url}...`);
+        const page = await this.downloadPage(url, validators);
+        if (page.notModified && cached) {
+            console.log('📦 Page not modified, using cached content');
+            await this.cache.put(key, cached.body, { ...cached.meta, fetchedAt: Date.now() });
+            return this.extractContentFromHtml(cached.body, new URL(url).hostname);
         }
 
+        await this.cache.put(key, page.html, {
+            etag: page.etag,
+            lastModified: page.lastModified,
+            fetchedAt: Date.now()
+        });
+        return this.extractContentFromHtml(page.html, page.hostname);
+    }
+
+    // Download a page's HTML (up to ~500KB), following redirects. Resolves
+    // with { notModified: true } when the server answers 304 to validators.
+    async downloadPage(url, validators = {}, redirectCount = 0) {
+        const maxRedirects = 5;
+
         if (redirectCount >= maxRedirects) {
             throw new Error(`Too many redirects (${maxRedirects}) for ${url}`);
         }
@@ -278,7 +468,8 @@ class LinkLogCLI {
                     'Accept-Language': 'en-US,en;q=0.5',
                     'Accept-Encoding': 'identity',
                     'Connection': 'close',
-                    'Upgrade-Insecure-Requests': '1'
+                    'Upgrade-Insecure-Requests': '1',
+                    ...validators
                 },
                 timeout: 30000
             };
@@ -286,6 +477,22 @@ class LinkLogCLI {
             const self = this;
             const req = client.request(options, function(res) {
                 let data = '';
+                let settled = false;
+                const finish = () => {
+                    if (settled) return;
+                    settled = true;
+                    resolve({
+                        html: data,
+                        hostname: urlObj.hostname,
+                        etag: res.headers.etag || null,
+                        lastModified: res.headers['last-modified'] || null
+                    });
+                };
+
+                if (res.statusCode === 304) {
+                    res.resume();
+                    return resolve({ notModified: true });
+                }
 
                 // Handle redirects
                 if (res.statusCode >= 300 && res.statusCode < 400 && res.headers.location) {
@@ -298,7 +505,8 @@ class LinkLogCLI {
                         redirectUrl = new URL(redirectUrl, url).href;
                     }
 
-                    return self.fetchPageContent(redirectUrl, redirectCount + 1).then(resolve).catch(reject);
+                    res.resume();
+                    return self.downloadPage(redirectUrl, validators, redirectCount + 1).then(resolve).catch(reject);
                 }
 
                 if (res.statusCode !== 200) {
@@ -312,15 +520,11 @@ class LinkLogCLI {
                     if (data.length > 500000) {
                         res.removeAllListeners();
                         res.destroy();
-                        const result = self.extractContentFromHtml(data, urlObj.hostname);
-                        resolve(result);
+                        finish();
                     }
                 });
 
-                res.on('end', function() {
-                    const result = self.extractContentFromHtml(data, urlObj.hostname);
-                    resolve(result);
-                });
+                res.on('end', finish);
             });
 
             req.on('error', (error) => {
@@ -381,10 +585,10 @@ class LinkLogCLI {
         }
     }
 
-    async fetchPageTitle(url, redirectCount = 0) {
+    async fetchPageTitle(url) {
         // Legacy function - use fetchPageContent for new functionality
         try {
-            const { title } = await this.fetchPageContent(url, redirectCount);
+            const { title } = await this.fetchPageContent(url);
             return title;
         } catch (error) {
             throw error;
@@ -484,6 +688,21 @@ class LinkLogCLI {
             }]
         });
 
+        // The prompt embeds the page content (and, for tags, the summary),
+        // so an unchanged page gets the earlier answer back without a call
+        const cacheKey = `claude:${this.cache.hash(payload)}`;
+        const cached = await this.cache.get(cacheKey);
+        if (cached) {
+            console.log('📦 Using cached Claude response');
+            return cached.body;
+        }
+
+        const text = await this.requestClaude(payload, apiKey);
+        await this.cache.put(cacheKey, text);
+        return text;
+    }
+
+    async requestClaude(payload, apiKey) {
         return new Promise((resolve, reject) => {
             const options = {
                 hostname: 'api.anthropic.com',
@@ -609,8 +828,12 @@ IMPORTANT:
         }
     }
 
-    async buildSite() {
+    async buildSite(changedFiles = [LINKLOG_DATA_FILE]) {
         console.log('🔨 Building site...');
+        if (await this.requestIncrementalBuild(changedFiles)) {
+            console.log('✅ Site built successfully');
+            return;
+        }
         try {
             execSync('npm run build:ci', { stdio: 'inherit' });
             console.log('✅ Site built successfully');
@@ -619,6 +842,36 @@ IMPORTANT:
         }
     }
 
+    // When run by the dashboard, LLOG_BUILD_URL points at its warm,
+    // incremental Eleventy builder. Returns false if there is none to
+    // reach, so the caller does a full build; a failed build throws.
+    async requestIncrementalBuild(changedFiles) {
+        const buildUrl = process.env.LLOG_BUILD_URL;
+        if (!buildUrl) return false;
+
+        let response;
+        try {
+            response = await fetch(buildUrl, {
+                method: 'POST',
+                headers: { 'Content-Type': 'application/json' },
+                body: JSON.stringify({ changed: changedFiles }),
+            });
+        } catch (error) {
+            console.warn(`⚠️ Dashboard builder unavailable, running a full build: ${error.message}`);
+            return false;
+        }
+        if (!response.ok) {
+            let detail = response.statusText;
+            try {
+                detail = (await response.json()).detail || detail;
+            } catch {
+                // Not JSON; keep the status text
+            }
+            throw new Error(`Build failed: ${detail}`);
+        }
+        return true;
+    }
+
     async storeInitialCommitHash() {
         try {
             this.initialCommitHash = execSync('git rev-parse HEAD', { stdio: 'pipe', encoding: 'utf8' }).trim();
@@ -656,11 +909,14 @@ IMPORTANT:
         }
     }
 
-    async commitAndPush(url) {
+    async commitAndPush(urls) {
         console.log('📤 Committing and pushing changes...');
+        const message = urls.length === 1
+            ? `Add link to linklog: ${urls[0]}`
+            : `Add ${urls.length} links to linklog\n\n${urls.map(url => `- ${url}`).join('\n')}`;
         try {
             execSync('git add .', { stdio: 'pipe' });
-            execSync(`git commit -m "Add link to linklog: ${url}"`, { stdio: 'pipe' });
+            execFileSync('git', ['commit', '-m', message], { stdio: 'pipe' });
             this.gitStashApplied = true;
             execSync('git push origin main', { stdio: 'pipe' });
             this.pushCompleted = true;
@@ -670,7 +926,7 @@ IMPORTANT:
         }
     }
 
-    async verifyDeployment(entryId) {
+    async verifyDeployment(entryIds) {
         console.log('🌐 Verifying online deployment...');
         
         // Get the site URL from meta.js, then git remote, then default
@@ -703,9 +959,8 @@ IMPORTANT:
 
                 const rawHtml = await this.fetchRawHtml(linklogUrl);
 
-                // Check if our entry ID appears in the HTML as an id attribute
-                const entryIdPattern = `id="entry-${entryId}"`;
-                if (rawHtml.includes(entryIdPattern)) {
+                // Check if all our entry IDs appear in the HTML as id attributes
+                if (entryIds.every(entryId => rawHtml.includes(`id="entry-${entryId}"`))) {
                     const totalTime = Math.round((Date.now() - startTime) / 1000);
                     console.log(`✅ Deployment verified - entry is live! (${totalTime}s)`);
                     return true;
@@ -736,6 +991,111 @@ IMPORTANT:
         return new Promise(resolve => setTimeout(resolve, ms));
     }
 
+    async prepareEntry(url, tags) {
+        // Fetch page information and content
+        let title, content;
+        try {
+            const pageInfo = await this.fetchPageContent(url);
+            title = pageInfo.title;
+            content = pageInfo.content;
+            console.log(`✅ Successfully extracted ${content.length} characters of content`);
+        } catch (error) {
+            console.error(`❌ Failed to fetch page content: ${error.message}`);
+            console.log('📝 Will generate summary without content');
+            // Fallback to title-only extraction
+            try {
+                title = await this.fetchPageTitle(url);
+            } catch (titleError) {
+                console.error(`❌ Failed to fetch page title: ${titleError.message}`);
+                title = new URL(url).hostname;
+            }
+            content = '';
+        }
+
+        // Generate summary
+        const summary = await this.generateSummary(url, title, content);
+
+        // Combine user tags with suggested tags (max 5 tags unless user provides more)
+        let finalTags = [...tags];
+        const tagsToRequest = Math.max(0, 5 - tags.length);
+
+        if (tagsToRequest > 0) {
+            // Request additional tags from Claude to reach 5 total
+            const suggestedTags = await this.suggestTags(`${title} ${summary}`, tags, tagsToRequest);
+            finalTags = [...tags, ...suggestedTags];
+
+            // Remove any duplicates (keep first occurrence - user tags have priority)
+            finalTags = finalTags.filter((tag, index, self) => self.indexOf(tag) === index);
+        }
+        // If user provided 5+ tags, finalTags already equals tags (no AI suggestion needed)
+
+        return {
+            id: this.generateEntryId(),
+            url,
+            title,
+            summary,
+            tags: finalTags,
+            dateAdded: new Date().toISOString()
+        };
+    }
+
+    assertNotInLinkLog(linklogData, url) {
+        const existingEntry = this.indexByUrl(linklogData.entries).get(this.normalizeUrl(url));
+        if (existingEntry) {
+            throw new Error(`URL already exists in linklog with ID: ${existingEntry.id}`);
+        }
+    }
+
+    // Add entries to the linklog and deploy them with a single build,
+    // commit, push and verification. Entries whose URL is already in the
+    // linklog are skipped rather than failing the whole batch.
+    async publishEntries(newEntries) {
+        // Store initial commit hash for potential rollback
+        await this.storeInitialCommitHash();
+
+        // Create backup of data file
+        await this.createBackup(LINKLOG_DATA_FILE);
+
+        // Load existing data and re-check for duplicates, entries may have
+        // been prepared before another run published the same URL
+        const linklogData = await this.loadLinkLogData();
+        const seenUrls = this.indexByUrl(linklogData.entries);
+        const published = [];
+        const skipped = [];
+        for (const entry of newEntries) {
+            const key = this.normalizeUrl(entry.url);
+            if (seenUrls.has(key)) {
+                console.warn(`⚠️ Skipping ${entry.url}: URL already exists in linklog`);
+                skipped.push({ id: entry.id, url: entry.url, reason: 'URL already exists in linklog' });
+                continue;
+            }
+            seenUrls.set(key, entry);
+            published.push(entry);
+        }
+
+        if (published.length === 0) {
+            return { published: [], skipped };
+        }
+
+        // Add to data, newest first
+        linklogData.entries.unshift(...published);
+        await this.saveLinkLogData(linklogData);
+        for (const entry of published) {
+            console.log(`✅ Added entry with ID: ${entry.id}`);
+        }
+
+        // Build site
+        await this.buildSite();
+
+        // Commit and push
+        await this.commitAndPush(published.map(entry => entry.url));
+
+        // Verify deployment
+        await this.verifyDeployment(published.map(entry => entry.id));
+
+        return { published: published.map(entry => entry.id), skipped };
+    }
+
     async run(args) {
         try {
             await this.acquireLock();
@@ -747,88 +1107,98 @@ IMPORTANT:
                 console.log(`🏷️ Tags: ${tags.join(', ')}`);
             }
 
-            // Store initial commit hash for potential rollback
-            await this.storeInitialCommitHash();
-
-            // Create backup of data file
-            await this.createBackup(LINKLOG_DATA_FILE);
+            // Check for duplicate URL before doing any expensive work
+            this.assertNotInLinkLog(await this.loadLinkLogData(), url);
 
-            // Load existing data
-            const linklogData = await this.loadLinkLogData();
+            const newEntry = await this.prepareEntry(url, tags);
+            await this.publishEntries([newEntry]);
 
-            // Check for duplicate URL
-            const existingEntry = linklogData.entries.find(entry => entry.url === url);
-            if (existingEntry) {
-                throw new Error(`URL already exists in linklog with ID: ${existingEntry.id}`);
-            }
+            await this.cleanup();
+            console.log('🎉 Link log entry successfully added and deployed!');
 
-            // Fetch page information and content
-            let title, content;
-            try {
-                const pageInfo = await this.fetchPageContent(url);
-                title = pageInfo.title;
-                content = pageInfo.content;
-                console.log(`✅ Successfully extracted ${content.length} characters of content`);
-            } catch (error) {
-                console.error(`❌ Failed to fetch page content: ${error.message}`);
-                console.log('📝 Will generate summary without content');
-                // Fallback to title-only extraction
-                try {
-                    title = await this.fetchPageTitle(url);
-                } catch (titleError) {
-                    console.error(`❌ Failed to fetch page title: ${titleError.message}`);
-                    title = new URL(url).hostname;
-                }
-                content = '';
-            }
+        } catch (error) {
+            console.error(`❌ Error: ${error.message}`);
+            await this.rollback();
+            process.exit(1);
+        }
+    }
 
-            // Generate summary
-            const summary = await this.generateSummary(url, title, content);
+    // Fetch, summarise and tag a link without touching the repository.
+    // Safe to run concurrently: no lock is taken and nothing is written
+    // except the prepared entry itself.
+    async runPrepare(args, outputFile) {
+        try {
+            await this.validateApiKey();
 
-            // Combine user tags with suggested tags (max 5 tags unless user provides more)
-            let finalTags = [...tags];
-            const tagsToRequest = Math.max(0, 5 - tags.length);
+            const { url, tags } = this.parseArguments(args);
+            console.log(`🚀 Processing URL: ${url}`);
+            if (tags.length > 0) {
+                console.log(`🏷️ Tags: ${tags.join(', ')}`);
+            }
 
-            if (tagsToRequest > 0) {
-                // Request additional tags from Claude to reach 5 total
-                const suggestedTags = await this.suggestTags(`${title} ${summary}`, tags, tagsToRequest);
-                finalTags = [...tags, ...suggestedTags];
+            this.assertNotInLinkLog(await this.loadLinkLogData(), url);
 
-                // Remove any duplicates (keep first occurrence - user tags have priority)
-                finalTags = finalTags.filter((tag, index, self) => self.indexOf(tag) === index);
+            const newEntry = await this.prepareEntry(url, tags);
+            const serialized = JSON.stringify(newEntry, null, 2);
+            if (outputFile) {
+                await fs.writeFile(outputFile, serialized);
+            } else {
+                process.stdout.write(serialized + '\n');
             }
-            // If user provided 5+ tags, finalTags already equals tags (no AI suggestion needed)
-
-            // Create new entry
-            const newEntry = {
-                id: this.generateEntryId(),
-                url,
-                title,
-                summary,
-                tags: finalTags,
-                dateAdded: new Date().toISOString()
-            };
+            console.log(`✅ Prepared entry with ID: ${newEntry.id}`);
 
-            // Add to data
-            linklogData.entries.unshift(newEntry);
-            await this.saveLinkLogData(linklogData);
-            console.log(`✅ Added entry with ID: ${newEntry.id}`);
+        } catch (error) {
+            console.error(`❌ Error: ${error.message}`);
+            process.exit(1);
+        }
+    }
 
-            // Build site
-            await this.buildSite();
+    // Add previously prepared entries (a single entry or an array), then
+    // build, commit, push and verify once for all of them. The outcome for
+    // each entry is written to reportFile when given.
+    async runPublish(entriesFile, reportFile) {
+        try {
+            await this.acquireLock();
 
-            // Commit and push
-            await this.commitAndPush(url);
+            const parsed = JSON.parse(await fs.readFile(entriesFile, 'utf8'));
+            const newEntries = Array.isArray(parsed) ? parsed : [parsed];
+            for (const entry of newEntries) {
+                console.log(`🚀 Publishing URL: ${entry.url}`);
+            }
 
-            // Verify deployment
-            await this.verifyDeployment(newEntry.id);
+            const report = await this.publishEntries(newEntries);
+            if (reportFile) {
+                await fs.writeFile(reportFile, JSON.stringify(report, null, 2));
+            }
 
             await this.cleanup();
-            console.log('🎉 Link log entry successfully added and deployed!');
+            console.log(`🎉 ${report.published.length} link log entr${report.published.length === 1 ? 'y' : 'ies'} successfully added and deployed!`);
 
         } catch (error) {
             console.error(`❌ Error: ${error.message}`);
-            await this.rollback();
+            if (this.pushCompleted) {
+                // The entries are already pushed; reverting would only mean
+                // building and pushing them again. The caller can retry the
+                // check with --verify-entries.
+                console.error('❌ Entries were pushed but not verified, leaving them in place');
+                await this.cleanup();
+            } else {
+                await this.rollback();
+            }
+            process.exit(1);
+        }
+    }
+
+    // Re-run the deployment check for entries that were already pushed.
+    // Read-only, so no lock is taken.
+    async runVerify(entriesFile) {
+        try {
+            const parsed = JSON.parse(await fs.readFile(entriesFile, 'utf8'));
+            const entries = Array.isArray(parsed) ? parsed : [parsed];
+            await this.verifyDeployment(entries.map(entry => entry.id));
+            console.log(`🎉 ${entries.length} link log entr${entries.length === 1 ? 'y' : 'ies'} verified!`);
+        } catch (error) {
+            console.error(`❌ Error: ${error.message}`);
             process.exit(1);
         }
     }
@@ -855,12 +1225,26 @@ process.on('SIGTERM', async () => {
 program
     .name('llog')
     .description('Add links to your link log')
-    .argument('<url>', 'URL to add to the link log')
+    .argument('[url]', 'URL to add to the link log')
     .argument('[tags...]', 'Tags to associate with the link (prefix with #)')
-    .action(async (url, tags) => {
+    .option('--prepare-only', 'Fetch, summarise and tag the URL without changing the repository')
+    .option('--output <file>', 'Write the prepared entry (or, with --publish-entries, the per-entry report) to this file')
+    .option('--publish-entries <file>', 'Publish one or an array of entries written by --prepare-only')
+    .option('--verify-entries <file>', 'Check that already pushed entries are live on the site')
+    .action(async (url, tags, options) => {
         const cli = new LinkLogCLI();
         global.linklogCLI = cli;
-        await cli.run([url, ...tags]);
+        if (options.publishEntries) {
+            await cli.runPublish(options.publishEntries, options.output);
+        } else if (options.verifyEntries) {
+            await cli.runVerify(options.verifyEntries);
+        } else if (!url) {
+            program.error('error: missing required argument \'url\'');
+        } else if (options.prepareOnly) {
+            await cli.runPrepare([url, ...tags], options.output);
+        } else {
+            await cli.run([url, ...tags]);
+        }
     });
 
 if (require.main === module) {